@@ -0,0 +1,105 @@
+"""
+In-process read-through cache for small, rarely written reference data
+(categories, supermarkets).
+
+Entries expire after CACHE_TTL_SECONDS and are dropped explicitly when a
+write handler calls invalidate(); invalidations reach other workers via
+the pubsub backend (Postgres LISTEN/NOTIFY). Every drop bumps the key's
+generation, and a load only stores its result if the generation it
+started from is still current, so a load that raced with a write cannot
+cache pre-write data. Invalidations sent while the LISTEN connection was
+down are lost, so the whole cache is cleared each time it (re)connects.
+"""
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.pubsub import pubsub
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+class ReferenceCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0  # bumped by clear()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def generation(self, key: str) -> Tuple[int, int]:
+        """Token that changes whenever key is dropped or the cache cleared."""
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key: str, value: Any, generation: Optional[Tuple[int, int]] = None) -> None:
+        """Cache value for key; with a generation, only if key hasn't been
+        dropped since that generation was read."""
+        with self._lock:
+            current = (self._epoch, self._generations.get(key, 0))
+            if generation is not None and generation != current:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading and caching it on a miss."""
+        value = self.get(key)
+        if value is None:
+            generation = self.generation(key)
+            value = await loader()
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self, db: Session, key: str) -> None:
+        """Drop key in every worker once db's transaction commits."""
+        pubsub.publish(db, INVALIDATION_CHANNEL, {"key": key})
+
+    def drop(self, key: str) -> None:
+        """Drop key from this worker's cache immediately."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every key from this worker's cache immediately."""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+reference_cache = ReferenceCache(CACHE_TTL_SECONDS)
+
+pubsub.subscribe(INVALIDATION_CHANNEL, lambda message: reference_cache.drop(message["key"]))
+pubsub.on_connect(reference_cache.clear)
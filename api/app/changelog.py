@@ -0,0 +1,22 @@
+"""
+Sync change log helpers (tombstones for deleted rows).
+"""
+from typing import Iterable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+def record_deletions(db: Session, entity_type: str, entity_ids: Iterable[int]) -> None:
+    """
+    Write tombstones for deleted rows in the caller's transaction, so the
+    deletion reaches offline clients via GET /api/sync/since.
+    """
+    rows = [
+        {"entity_type": entity_type, "entity_id": entity_id}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.execute(insert(models.SyncTombstone), rows)
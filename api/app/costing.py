@@ -0,0 +1,180 @@
+"""
+Meal cost engine.
+
+Ingredient costs are computed from the product's current price, price type
+and package size, driven by the conversion tables below instead of
+per-case branches. Products are loaded with one query per batch, so costing
+a meal (or re-costing many meals) does not issue a query per ingredient.
+"""
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.jobs import jobs
+
+logger = logging.getLogger(__name__)
+
+# Meals re-costed per transaction after a price change
+RECOST_BATCH_SIZE = int(os.getenv("RECOST_BATCH_SIZE", "200"))
+
+# Product fields that change what its ingredients cost
+COST_FIELDS = {"price_cents", "price_type", "package_size", "package_unit"}
+
+# Unit -> (multiplier, divisor) into the unit a price refers to.
+# Kept as two factors (not one float) so results match q * m / d exactly.
+IDENTITY = (1, 1)
+
+# g and ml to kg and l; kg, l and stück are base units already
+BASE_UNIT_FACTORS = {"g": (1, 1000), "ml": (1, 1000)}
+
+# Price type -> unit factors for quantities priced by weight/volume
+PRICE_BASIS_FACTORS = {
+    "per_kg": BASE_UNIT_FACTORS,
+    "per_liter": BASE_UNIT_FACTORS,
+    "per_100g": {"g": (1, 100), "kg": (1000, 100)},
+}
+
+# Product columns the engine needs (see load_cost_bases)
+COST_BASIS_COLUMNS = (
+    models.Product.id,
+    models.Product.price_type,
+    models.Product.package_size,
+    models.Product.package_unit,
+    models.Product.current_price_cents,
+)
+
+Ingredient = Tuple[int, float, str]  # (product_id, quantity, quantity_unit)
+
+
+def _convert(quantity: float, unit: str, factors: dict) -> float:
+    multiplier, divisor = factors.get(unit, IDENTITY)
+    return quantity * multiplier / divisor
+
+
+def ingredient_cost(product, quantity: float, unit: str) -> int:
+    """
+    Cost in cents of `quantity` `unit` of a product (a Product or a row with
+    price_type, package_size, package_unit and current_price_cents).
+
+    per_package: share of the package price (whole price without a size)
+    per_kg / per_liter / per_100g: quantity converted to the priced unit
+    other price types: the product price
+    """
+    price = product.current_price_cents
+    if not price:
+        return 0
+
+    if product.price_type == "per_package":
+        if not product.package_size:
+            # No package size, assume price is per unit
+            return price
+        needed = _convert(quantity, unit, BASE_UNIT_FACTORS)
+        package = _convert(product.package_size, product.package_unit or unit, BASE_UNIT_FACTORS)
+        return int(round((needed / package) * price))
+
+    factors = PRICE_BASIS_FACTORS.get(product.price_type)
+    if factors is None:
+        return price
+    return int(round(_convert(quantity, unit, factors) * price))
+
+
+def load_cost_bases(db: Session, product_ids: Iterable[int]) -> Dict[int, object]:
+    """Price type, package and current price of products (one query)."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    rows = db.execute(
+        select(*COST_BASIS_COLUMNS).where(models.Product.id.in_(product_ids))
+    )
+    return {row.id: row for row in rows}
+
+
+def ingredient_costs(ingredients: Sequence[Ingredient], bases: Dict[int, object]) -> List[int]:
+    """Costs of many ingredients in one pass over preloaded cost bases."""
+    return [
+        ingredient_cost(bases[product_id], quantity, unit)
+        for product_id, quantity, unit in ingredients
+    ]
+
+
+def recost_meals(db: Session, meal_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute ingredient costs and totals of the given meals (all meals if
+    None) from current prices in the caller's transaction.
+
+    Reads ingredients joined with their products in one query and writes
+    only the rows whose cost changed, with one executemany per table.
+    Returns the number of meals whose total changed.
+    """
+    query = (
+        select(
+            models.MealIngredient.id,
+            models.MealIngredient.meal_id,
+            models.MealIngredient.quantity,
+            models.MealIngredient.quantity_unit,
+            models.MealIngredient.cost_cents,
+            *COST_BASIS_COLUMNS[1:],
+        )
+        .join(models.Product, models.Product.id == models.MealIngredient.product_id)
+    )
+    if meal_ids is not None:
+        meal_ids = set(meal_ids)
+        if not meal_ids:
+            return 0
+        query = query.where(models.MealIngredient.meal_id.in_(meal_ids))
+
+    changed_ingredients = []
+    totals: Dict[int, int] = {}
+    for row in db.execute(query):
+        cost = ingredient_cost(row, row.quantity, row.quantity_unit)
+        totals[row.meal_id] = totals.get(row.meal_id, 0) + cost
+        if cost != row.cost_cents:
+            changed_ingredients.append({"id": row.id, "cost_cents": cost})
+
+    meal_query = select(models.Meal.id, models.Meal.total_cost_cents)
+    if meal_ids is not None:
+        meal_query = meal_query.where(models.Meal.id.in_(meal_ids))
+    changed_meals = [
+        {"id": meal_id, "total_cost_cents": totals.get(meal_id, 0)}
+        for meal_id, total in db.execute(meal_query)
+        if totals.get(meal_id, 0) != total
+    ]
+
+    if changed_ingredients:
+        db.execute(update(models.MealIngredient), changed_ingredients)
+    if changed_meals:
+        db.execute(update(models.Meal), changed_meals)
+    return len(changed_meals)
+
+
+def meals_using_products(db: Session, product_ids: Iterable[int]) -> List[int]:
+    """Ids of meals with an ingredient of one of the products."""
+    return list(db.scalars(
+        select(models.MealIngredient.meal_id)
+        .where(models.MealIngredient.product_id.in_(set(product_ids)))
+        .distinct()
+        .order_by(models.MealIngredient.meal_id)
+    ))
+
+
+@jobs.handler("recost_meals")
+def recost_meals_using_products(db: Session, product_ids: List[int]) -> None:
+    """
+    Job: re-cost only the meals using the given products, in batches of
+    RECOST_BATCH_SIZE meals committed separately so a large re-cost doesn't
+    hold locks on every meal at once. Safe to retry.
+    """
+    meal_ids = meals_using_products(db, product_ids)
+    changed = 0
+    for start in range(0, len(meal_ids), RECOST_BATCH_SIZE):
+        changed += recost_meals(db, meal_ids[start:start + RECOST_BATCH_SIZE])
+        db.commit()
+    logger.info(
+        "Re-costed %d meals for products %s (%d changed)",
+        len(meal_ids), sorted(product_ids), changed,
+    )
+
@@ -0,0 +1,52 @@
+"""
+ETag / conditional GET helpers.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+
+def make_etag(*version_parts) -> str:
+    """Strong ETag derived from values that change whenever the resource does."""
+    raw = "|".join(str(part) for part in version_parts)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def rows_digest(*columns, order_by):
+    """
+    SQL aggregate hashing columns of every aggregated row, for use as a
+    version. Unlike count() and max(change_seq) it changes whenever any row
+    is inserted, updated or deleted, even when transactions commit out of
+    change_seq (or updated_at) order.
+    """
+    return func.md5(
+        func.string_agg(
+            func.concat_ws(":", *columns), aggregate_order_by(literal(","), *order_by)
+        )
+    )
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match header matches the ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def apply_etag(request: Request, response: Response, *version_parts) -> Optional[Response]:
+    """
+    Set the ETag for a collection version on the response.
+    Returns a 304 response when the client already has this version, so the
+    caller can skip loading and serializing the collection.
+    """
+    etag = make_etag(*version_parts)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
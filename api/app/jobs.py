@@ -0,0 +1,264 @@
+"""
+Background jobs for deferred work off the request path.
+
+Handlers enqueue a job inside their database transaction; it becomes
+runnable only once that transaction commits (nothing runs on rollback).
+JOB_WORKERS threads in every API worker run the jobs, each with its own
+session, retrying failures with exponential backoff up to
+JOB_MAX_ATTEMPTS times.
+
+With the postgres backend jobs are rows in background_jobs, inserted in
+the enqueuing transaction, so they survive restarts and are shared by all
+uvicorn workers: workers claim due rows with FOR UPDATE SKIP LOCKED and
+push their run_at forward by JOB_LEASE_SECONDS while running, so a job
+whose worker died is picked up again once the lease expires. Jobs run at
+least once and must be idempotent. The memory backend keeps jobs in a
+per-process queue (single worker setups, tests).
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import DATABASE_URL, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+JOBS_BACKEND = os.getenv(
+    "JOBS_BACKEND",
+    "postgres" if make_url(DATABASE_URL).get_backend_name() == "postgresql" else "memory",
+)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+# Idle workers look for due jobs (retries, other workers' jobs) this often
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+
+# How long a claimed job is hidden from other workers while it runs
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+# Retry delays: 2s, 4s, 8s, ... capped at 5 minutes
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 300
+
+# Called with a session and the job's keyword arguments; the session is
+# committed after the handler returns
+Handler = Callable[..., None]
+
+
+def retry_delay(attempts: int) -> int:
+    return min(RETRY_BASE_SECONDS ** attempts, RETRY_MAX_SECONDS)
+
+
+class JobQueue:
+    def __init__(self, backend: str, workers: int, max_attempts: int):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._handlers: Dict[str, Handler] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"enqueued": 0, "succeeded": 0, "retried": 0, "failed": 0, "seconds": 0.0}
+        )
+
+    def handler(self, name: str) -> Callable[[Handler], Handler]:
+        """Register the function that runs jobs called name."""
+        def register(func: Handler) -> Handler:
+            self._handlers[name] = func
+            return func
+        return register
+
+    def enqueue(self, db: Session, name: str, /, **payload) -> None:
+        """
+        Run handler name(db, **payload) once db's current transaction
+        commits. payload must be JSON serializable.
+        """
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job {name!r}")
+        db.info.setdefault("jobs_pending", []).append((name, payload))
+        if self.backend == "postgres":
+            db.execute(insert(models.BackgroundJob).values(name=name, payload=payload))
+
+    def submit(self, name: str, payload: dict) -> None:
+        """Hand a committed job to the workers (thread-safe)."""
+        self._count(name, "enqueued")
+        if self.backend == "postgres":
+            self._wakeup.set()
+        else:
+            self._queue.put((name, payload, 0))
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the workers after their current job (queued jobs are kept
+        by the postgres backend, lost with the memory backend)."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self, db: Optional[Session] = None) -> dict:
+        """Counters of this process, plus queue depth."""
+        with self._lock:
+            jobs = {name: dict(counters) for name, counters in self._metrics.items()}
+        result = {"backend": self.backend, "workers": len(self._threads), "jobs": jobs}
+        if self.backend == "postgres" and db is not None:
+            job = models.BackgroundJob
+            pending, failed = db.execute(
+                select(
+                    func.count().filter(job.failed_at.is_(None)),
+                    func.count().filter(job.failed_at.is_not(None)),
+                )
+            ).one()
+            result.update(pending=pending, failed=failed)
+        else:
+            result.update(pending=self._queue.qsize())
+        return result
+
+    def _count(self, name: str, counter: str, amount: float = 1) -> None:
+        with self._lock:
+            self._metrics[name][counter] += amount
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.backend == "postgres":
+                    if not self._run_next_durable():
+                        if self._wakeup.wait(JOB_POLL_SECONDS):
+                            self._wakeup.clear()
+                    continue
+                try:
+                    name, payload, attempts = self._queue.get(timeout=JOB_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                self._run_next_memory(name, payload, attempts + 1)
+            except Exception:
+                # Database unavailable etc.: back off instead of spinning
+                logger.exception("job worker error")
+                self._stopping.wait(JOB_POLL_SECONDS)
+
+    def _run(self, db: Session, name: str, payload: dict) -> None:
+        started = time.monotonic()
+        try:
+            self._handlers[name](db, **payload)
+        finally:
+            self._count(name, "seconds", time.monotonic() - started)
+
+    def _run_next_memory(self, name: str, payload: dict, attempts: int) -> None:
+        db = SessionLocal()
+        try:
+            self._run(db, name, payload)
+            db.commit()
+            self._count(name, "succeeded")
+        except Exception:
+            db.rollback()
+            if attempts >= self.max_attempts:
+                logger.exception("job %s failed after %d attempts, giving up", name, attempts)
+                self._count(name, "failed")
+                return
+            logger.warning("job %s failed (attempt %d), retrying", name, attempts, exc_info=True)
+            self._count(name, "retried")
+            timer = threading.Timer(
+                retry_delay(attempts), self._queue.put, ((name, payload, attempts),)
+            )
+            timer.daemon = True
+            timer.start()
+        finally:
+            db.close()
+
+    def _run_next_durable(self) -> bool:
+        """Claim and run one due job; False if there was none."""
+        job = models.BackgroundJob
+        db = SessionLocal()
+        try:
+            due = (
+                select(job.id)
+                .where(job.failed_at.is_(None), job.run_at <= func.now())
+                .order_by(job.run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            claimed = db.execute(
+                update(job)
+                .where(job.id == due)
+                .values(
+                    attempts=job.attempts + 1,
+                    run_at=func.now() + timedelta(seconds=JOB_LEASE_SECONDS),
+                )
+                .returning(job.id, job.name, job.payload, job.attempts)
+            ).first()
+            db.commit()
+            if claimed is None:
+                return False
+
+            try:
+                if claimed.name not in self._handlers:
+                    raise LookupError(f"No handler registered for job {claimed.name!r}")
+                self._run(db, claimed.name, claimed.payload)
+                db.execute(job.__table__.delete().where(job.id == claimed.id))
+                db.commit()
+                self._count(claimed.name, "succeeded")
+            except Exception as e:
+                db.rollback()
+                gave_up = claimed.attempts >= self.max_attempts
+                if gave_up:
+                    logger.exception(
+                        "job %s #%d failed after %d attempts, giving up",
+                        claimed.name, claimed.id, claimed.attempts,
+                    )
+                else:
+                    logger.warning(
+                        "job %s #%d failed (attempt %d), retrying",
+                        claimed.name, claimed.id, claimed.attempts, exc_info=True,
+                    )
+                db.execute(
+                    update(job)
+                    .where(job.id == claimed.id)
+                    .values(
+                        last_error=repr(e),
+                        run_at=func.now() + timedelta(seconds=retry_delay(claimed.attempts)),
+                        failed_at=func.now() if gave_up else None,
+                    )
+                )
+                db.commit()
+                self._count(claimed.name, "failed" if gave_up else "retried")
+            return True
+        finally:
+            db.close()
+
+
+jobs = JobQueue(JOBS_BACKEND, JOB_WORKERS, JOB_MAX_ATTEMPTS)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_after_commit(session: Session) -> None:
+    for name, payload in session.info.pop("jobs_pending", []):
+        jobs.submit(name, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("jobs_pending", None)
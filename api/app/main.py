@@ -2,12 +2,19 @@
 FastAPI application entry point.
 """
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
+from sqlalchemy.orm import Session
 
+from app.cache import reference_cache
+from app.compression import CompressionMiddleware
+from app.db import get_db
+from app.jobs import jobs
+from app.pubsub import pubsub
 from app.routers import (
+    analytics,
     categories,
     products,
     list,
@@ -41,6 +48,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses (brotli if available, otherwise gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "500")),
+)
+
 # Include routers
 app.include_router(
     supermarkets.router, prefix="/api/supermarkets", tags=["supermarkets"]
@@ -52,6 +65,29 @@ app.include_router(purchase.router)
 app.include_router(sync.router)
 app.include_router(meals.router)
 app.include_router(shopping_events.router)
+app.include_router(analytics.router)
+
+
+@app.on_event("startup")
+async def start_pubsub():
+    """Start delivering cross-worker notifications (cache invalidation, ...)."""
+    await pubsub.start()
+
+
+@app.on_event("shutdown")
+async def stop_pubsub():
+    await pubsub.stop()
+
+
+@app.on_event("startup")
+def start_jobs():
+    """Start the background job workers (shopping events, meal re-costing)."""
+    jobs.start()
+
+
+@app.on_event("shutdown")
+def stop_jobs():
+    jobs.stop()
 
 
 @app.get("/health")
@@ -60,6 +96,18 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters of the in-process reference data cache."""
+    return reference_cache.stats()
+
+
+@app.get("/api/jobs/stats")
+def job_stats(db: Session = Depends(get_db)):
+    """Background job counters of this worker and queue depth."""
+    return jobs.stats(db)
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
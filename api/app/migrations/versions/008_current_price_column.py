@@ -0,0 +1,36 @@
+"""add denormalized current price to products
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('current_price_cents', sa.Integer(), nullable=True))
+
+    # Backfill from the newest price history entry per product
+    op.execute("""
+        UPDATE products p
+        SET current_price_cents = latest.price_cents
+        FROM (
+            SELECT DISTINCT ON (product_id) product_id, price_cents
+            FROM product_prices
+            ORDER BY product_id, valid_from DESC, id DESC
+        ) AS latest
+        WHERE latest.product_id = p.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'current_price_cents')
@@ -0,0 +1,27 @@
+"""add trigram index for product name search
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # pg_trgm is a trusted extension (PostgreSQL 13+), no superuser needed
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_products_name_trgm ON products USING gin (name gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_trgm', table_name='products')
@@ -0,0 +1,23 @@
+"""add (name, id) index for keyset pagination of products
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_id', table_name='products')
@@ -0,0 +1,53 @@
+"""add change sequence and tombstones for delta sync
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = ['categories', 'products', 'product_prices', 'list_items']
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE sync_change_seq")
+
+    # Existing rows are numbered by the column default as it is added
+    for table in SYNCED_TABLES:
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('sync_change_seq')"), nullable=False))
+        op.create_index(f'ix_{table}_change_seq', table, ['change_seq'], unique=False)
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('sync_change_seq')"), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_tombstones_id'), 'sync_tombstones', ['id'], unique=False)
+    op.create_index('ix_sync_tombstones_change_seq', 'sync_tombstones', ['change_seq'], unique=False)
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_change_seq', table_name='sync_tombstones')
+    op.drop_index(op.f('ix_sync_tombstones_id'), table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+
+    for table in SYNCED_TABLES:
+        op.drop_index(f'ix_{table}_change_seq', table_name=table)
+        op.drop_column(table, 'change_seq')
+
+    op.execute("DROP SEQUENCE sync_change_seq")
@@ -0,0 +1,34 @@
+"""add idempotency keys for offline sync batches
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_applied_changes',
+        sa.Column('change_id', sa.String(length=64), nullable=False),
+        sa.Column('entity_type', sa.String(length=50), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('applied_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('change_id')
+    )
+    op.create_index('ix_sync_applied_changes_applied_at', 'sync_applied_changes', ['applied_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_applied_changes_applied_at', table_name='sync_applied_changes')
+    op.drop_table('sync_applied_changes')
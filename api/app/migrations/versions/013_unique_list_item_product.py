@@ -0,0 +1,50 @@
+"""make (list_id, product_id) unique on list items
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Merge duplicate rows into the oldest one (summing qty) and tombstone
+    # the rest so offline clients drop them on their next sync
+    op.execute("""
+        UPDATE list_items AS li
+        SET qty = d.total_qty,
+            is_checked = d.all_checked,
+            change_seq = nextval('sync_change_seq')
+        FROM (
+            SELECT min(id) AS keep_id, sum(qty) AS total_qty, bool_and(is_checked) AS all_checked
+            FROM list_items
+            GROUP BY list_id, product_id
+            HAVING count(*) > 1
+        ) AS d
+        WHERE li.id = d.keep_id
+    """)
+    op.execute("""
+        WITH deleted AS (
+            DELETE FROM list_items AS li
+            USING list_items AS keep
+            WHERE li.list_id = keep.list_id
+              AND li.product_id = keep.product_id
+              AND li.id > keep.id
+            RETURNING li.id
+        )
+        INSERT INTO sync_tombstones (entity_type, entity_id)
+        SELECT DISTINCT 'list_item', id FROM deleted
+    """)
+    op.create_unique_constraint('uq_list_items_list_product', 'list_items', ['list_id', 'product_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_list_items_list_product', 'list_items', type_='unique')
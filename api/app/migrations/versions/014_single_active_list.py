@@ -0,0 +1,80 @@
+"""allow only one active shopping list per supermarket
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Resolve existing duplicates: the oldest active list of a supermarket
+    # stays active and takes over the items of the others
+    op.execute("""
+        CREATE TEMPORARY TABLE extra_active_lists ON COMMIT DROP AS
+        SELECT sl.id AS list_id, keep.keep_id
+        FROM shopping_lists AS sl
+        JOIN (
+            SELECT supermarket_id, min(id) AS keep_id
+            FROM shopping_lists
+            WHERE is_active
+            GROUP BY supermarket_id
+        ) AS keep ON keep.supermarket_id = sl.supermarket_id
+        WHERE sl.is_active AND sl.id <> keep.keep_id
+    """)
+    # Items of the other lists, one row per kept list and product (several
+    # of them may hold the same product)
+    op.execute("""
+        CREATE TEMPORARY TABLE moved_list_items ON COMMIT DROP AS
+        SELECT e.keep_id, li.product_id, sum(li.qty) AS qty,
+               bool_and(li.is_checked) AS is_checked, min(li.added_at) AS added_at
+        FROM list_items AS li
+        JOIN extra_active_lists AS e ON e.list_id = li.list_id
+        GROUP BY e.keep_id, li.product_id
+    """)
+    # Add them to the kept list, adding the qty to items already on it ...
+    op.execute("""
+        INSERT INTO list_items (list_id, product_id, qty, is_checked, added_at)
+        SELECT keep_id, product_id, qty, is_checked, added_at FROM moved_list_items
+        ON CONFLICT (list_id, product_id) DO UPDATE
+        SET qty = list_items.qty + excluded.qty,
+            is_checked = false,
+            updated_at = now(),
+            change_seq = nextval('sync_change_seq')
+    """)
+    # ... and drop the originals
+    op.execute("""
+        WITH deleted AS (
+            DELETE FROM list_items AS li
+            USING extra_active_lists AS e
+            WHERE li.list_id = e.list_id
+            RETURNING li.id
+        )
+        INSERT INTO sync_tombstones (entity_type, entity_id)
+        SELECT 'list_item', id FROM deleted
+    """)
+    op.execute("""
+        UPDATE shopping_lists SET is_active = false, updated_at = now()
+        WHERE id IN (SELECT list_id FROM extra_active_lists)
+    """)
+
+    op.create_index(
+        'uq_shopping_lists_active_supermarket',
+        'shopping_lists',
+        ['supermarket_id'],
+        unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_shopping_lists_active_supermarket', table_name='shopping_lists')
@@ -0,0 +1,31 @@
+"""add composite indexes for time-ordered history queries
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Replaces the plain product_id index (same leading column, already sorted)
+    op.create_index('ix_product_prices_product_valid_from', 'product_prices', ['product_id', sa.text('valid_from DESC')], unique=False)
+    op.drop_index('ix_product_prices_product_id', table_name='product_prices')
+    op.create_index('ix_purchases_purchased_at', 'purchases', [sa.text('purchased_at DESC')], unique=False)
+    op.create_index('ix_list_items_list_added_at', 'list_items', ['list_id', 'added_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_list_items_list_added_at', table_name='list_items')
+    op.drop_index('ix_purchases_purchased_at', table_name='purchases')
+    op.create_index('ix_product_prices_product_id', 'product_prices', ['product_id'], unique=False)
+    op.drop_index('ix_product_prices_product_valid_from', table_name='product_prices')
@@ -0,0 +1,46 @@
+"""add background job queue and link shopping events to purchases
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_background_jobs_run_at', 'background_jobs', ['run_at'], unique=False, postgresql_where=sa.text('failed_at IS NULL'))
+
+    # Makes the deferred shopping event insert idempotent when a job is retried
+    op.add_column('shopping_events', sa.Column('purchase_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('shopping_events_purchase_id_fkey', 'shopping_events', 'purchases', ['purchase_id'], ['id'], ondelete='SET NULL')
+    op.create_unique_constraint('shopping_events_purchase_id_key', 'shopping_events', ['purchase_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('shopping_events_purchase_id_key', 'shopping_events', type_='unique')
+    op.drop_constraint('shopping_events_purchase_id_fkey', 'shopping_events', type_='foreignkey')
+    op.drop_column('shopping_events', 'purchase_id')
+    op.drop_index('ix_background_jobs_run_at', table_name='background_jobs')
+    op.drop_table('background_jobs')
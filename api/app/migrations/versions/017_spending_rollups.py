@@ -0,0 +1,49 @@
+"""add monthly spending rollups
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'spending_rollups',
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('supermarket_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('total_cents', sa.BigInteger(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['supermarket_id'], ['supermarkets.id'], ),
+        sa.PrimaryKeyConstraint('month', 'supermarket_id', 'category_id'),
+    )
+
+    # Backfill from existing purchases (checkout keeps it current from here on)
+    op.execute("""
+        INSERT INTO spending_rollups (month, supermarket_id, category_id, total_cents, item_count)
+        SELECT date_trunc('month', timezone('UTC', p.purchased_at))::date,
+               l.supermarket_id,
+               coalesce(pr.category_id, 0),
+               sum(pi.qty * pi.price_cents_at_purchase),
+               sum(pi.qty)
+        FROM purchase_items pi
+        JOIN purchases p ON p.id = pi.purchase_id
+        JOIN shopping_lists l ON l.id = p.list_id
+        JOIN products pr ON pr.id = pi.product_id
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('spending_rollups')
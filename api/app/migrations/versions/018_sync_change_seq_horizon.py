@@ -0,0 +1,73 @@
+"""allocate sync change sequence values behind a visibility horizon
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = ['categories', 'products', 'product_prices', 'list_items', 'sync_tombstones']
+
+
+def upgrade() -> None:
+    # Highest value handed out so far (sequences are not transactional)
+    op.execute("""
+        CREATE FUNCTION sync_last_change_seq() RETURNS bigint
+        LANGUAGE sql VOLATILE AS $$
+            SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END
+            FROM sync_change_seq
+        $$
+    """)
+
+    # Before a transaction's first allocation it takes a shared advisory lock
+    # keyed by the last value handed out, announcing in pg_locks (which,
+    # unlike its rows, is visible at once) that it may still commit values
+    # above that key. Shared locks never wait, so writers don't serialize.
+    op.execute("""
+        CREATE FUNCTION sync_next_change_seq() RETURNS bigint
+        LANGUAGE plpgsql VOLATILE AS $$
+        BEGIN
+            IF current_setting('sync.writer_xact', true) IS DISTINCT FROM pg_current_xact_id()::text THEN
+                PERFORM pg_advisory_xact_lock_shared(sync_last_change_seq());
+                PERFORM set_config('sync.writer_xact', pg_current_xact_id()::text, true);
+            END IF;
+            RETURN nextval('sync_change_seq');
+        END
+        $$
+    """)
+
+    # Highest change_seq below which every value is committed or abandoned:
+    # read the sequence first, then the announcements of writers in flight
+    op.execute("""
+        CREATE FUNCTION sync_safe_change_seq() RETURNS bigint
+        LANGUAGE plpgsql VOLATILE AS $$
+        DECLARE
+            horizon bigint := sync_last_change_seq();
+        BEGIN
+            RETURN least(horizon, (
+                SELECT min((classid::bigint << 32) | objid::bigint)
+                FROM pg_locks
+                WHERE locktype = 'advisory' AND objsubid = 1 AND pid <> pg_backend_pid()
+            ));
+        END
+        $$
+    """)
+
+    for table in SYNCED_TABLES:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN change_seq SET DEFAULT sync_next_change_seq()")
+
+
+def downgrade() -> None:
+    for table in SYNCED_TABLES:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN change_seq SET DEFAULT nextval('sync_change_seq')")
+    op.execute("DROP FUNCTION sync_safe_change_seq()")
+    op.execute("DROP FUNCTION sync_next_change_seq()")
+    op.execute("DROP FUNCTION sync_last_change_seq()")
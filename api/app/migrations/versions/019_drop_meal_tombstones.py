@@ -0,0 +1,24 @@
+"""remove tombstones of meals, which are not part of the sync feed
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '019'
+down_revision = '018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("DELETE FROM sync_tombstones WHERE entity_type IN ('meal', 'meal_ingredient')")
+
+
+def downgrade() -> None:
+    # The deleted tombstones were never read
+    pass
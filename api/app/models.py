@@ -3,6 +3,7 @@ SQLAlchemy models for the groceries app.
 """
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
@@ -12,13 +13,42 @@ from sqlalchemy import (
     Text,
     Float,
     Date,
+    Index,
+    Sequence,
+    UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.db import Base
 
 
+# Shared, monotonically increasing sequence stamped on every insert/update of
+# rows served by the sync feed. Clients use the highest value they have seen
+# as their cursor for GET /api/sync/since?seq=...
+sync_change_seq = Sequence("sync_change_seq", metadata=Base.metadata)
+
+
+def next_change_seq():
+    """
+    Next sync_change_seq value, allocated through sync_next_change_seq()
+    (migration 018) so the sync feed can tell which values may still be
+    committed by transactions in flight (see sync_safe_change_seq()).
+    """
+    return func.sync_next_change_seq()
+
+
+def change_seq_column():
+    """Indexed change sequence column, bumped by the database on every write."""
+    return Column(
+        BigInteger,
+        nullable=False,
+        server_default=next_change_seq(),
+        onupdate=next_change_seq(),
+        index=True,
+    )
+
+
 class Supermarket(Base):
     """Supermarkets/Stores where products are sold"""
 
@@ -50,6 +80,7 @@ class Category(Base):
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    change_seq = change_seq_column()
 
     # Relationships
     products = relationship("Product", back_populates="category")
@@ -59,6 +90,17 @@ class Product(Base):
     """Products available in the catalog"""
 
     __tablename__ = "products"
+    __table_args__ = (
+        # Trigram index backing ranked/fuzzy name search (requires pg_trgm)
+        Index(
+            "ix_products_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # Keyset pagination order for GET /api/products/page
+        Index("ix_products_name_id", "name", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False, index=True)
@@ -73,11 +115,14 @@ class Product(Base):
     )  # per_package, per_kg, per_100g, per_liter
     package_size = Column(Float, nullable=True)  # e.g., 500, 10, 1.5
     package_unit = Column(String(10), nullable=True)  # g, kg, stück, l, ml
+    # Denormalized copy of the newest ProductPrice, maintained by record_price()
+    current_price_cents = Column(Integer, nullable=True)
 
     is_active = Column(Boolean, default=True, index=True)
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    change_seq = change_seq_column()
 
     # Relationships
     category = relationship("Category", back_populates="products")
@@ -92,19 +137,32 @@ class Product(Base):
 
     @property
     def current_price(self):
-        """Get the most recent price"""
-        if self.prices:
-            return self.prices[0].price_cents
-        return None
+        """Get the most recent price (column read, no price history load)"""
+        return self.current_price_cents
+
+    def record_price(self, price_cents: int, currency: str = "EUR") -> "ProductPrice":
+        """
+        Create a new price history entry and update the current price.
+        The caller adds the returned ProductPrice to the session so both
+        writes are committed in the same transaction.
+        """
+        self.current_price_cents = price_cents
+        return ProductPrice(
+            product_id=self.id, price_cents=price_cents, currency=currency
+        )
 
 
 class ProductPrice(Base):
     """Price history for products"""
 
     __tablename__ = "product_prices"
+    __table_args__ = (
+        # Price history of a product, newest first (Product.prices order)
+        Index("ix_product_prices_product_valid_from", "product_id", text("valid_from DESC")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     price_cents = Column(
         Integer, nullable=False
     )  # Price in cents (e.g., 299 for €2.99)
@@ -115,6 +173,7 @@ class ProductPrice(Base):
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    change_seq = change_seq_column()
 
     # Relationships
     product = relationship("Product", back_populates="prices")
@@ -124,6 +183,16 @@ class ShoppingList(Base):
     """Shopping lists"""
 
     __tablename__ = "shopping_lists"
+    __table_args__ = (
+        # At most one active list per supermarket; also the index behind the
+        # active list lookup that precedes every list and checkout request
+        Index(
+            "uq_shopping_lists_active_supermarket",
+            "supermarket_id",
+            unique=True,
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False, default="Einkauf")
@@ -154,6 +223,12 @@ class ListItem(Base):
     """Items on a shopping list"""
 
     __tablename__ = "list_items"
+    __table_args__ = (
+        # A product appears at most once per list; adding it again raises qty
+        UniqueConstraint("list_id", "product_id", name="uq_list_items_list_product"),
+        # Items of a list in display order (ShoppingList.items order)
+        Index("ix_list_items_list_added_at", "list_id", "added_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     list_id = Column(
@@ -168,6 +243,7 @@ class ListItem(Base):
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    change_seq = change_seq_column()
 
     # Relationships
     shopping_list = relationship("ShoppingList", back_populates="items")
@@ -178,6 +254,10 @@ class Purchase(Base):
     """Completed purchases (history)"""
 
     __tablename__ = "purchases"
+    __table_args__ = (
+        # Purchase history, newest first
+        Index("ix_purchases_purchased_at", text("purchased_at DESC")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     list_id = Column(
@@ -290,6 +370,89 @@ class ShoppingEvent(Base):
     event_date = Column(Date, nullable=False, index=True)
     total_price_cents = Column(Integer, nullable=False)
     items = Column(JSONB, nullable=False)  # List of products with qty and price
+    # Checkout this event was created for (one event per purchase)
+    purchase_id = Column(
+        Integer,
+        ForeignKey("purchases.id", ondelete="SET NULL"),
+        nullable=True,
+        unique=True,
+    )
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class SyncTombstone(Base):
+    """Deleted rows, so offline clients can drop them from their local copy"""
+
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(50), nullable=False)  # list_item, category, ...
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(
+        BigInteger,
+        nullable=False,
+        server_default=next_change_seq(),
+        index=True,
+    )
+    deleted_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+class SyncAppliedChange(Base):
+    """Idempotency keys of applied offline changes, so retried batches are no-ops"""
+
+    __tablename__ = "sync_applied_changes"
+
+    change_id = Column(String(64), primary_key=True)  # client-generated
+    entity_type = Column(String(50), nullable=False)
+    result = Column(JSONB, nullable=False)  # result returned on first apply
+    applied_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+class SpendingRollup(Base):
+    """Spend per month, supermarket and category, maintained at checkout"""
+
+    __tablename__ = "spending_rollups"
+
+    month = Column(Date, primary_key=True)  # first day of the month (UTC)
+    supermarket_id = Column(
+        Integer, ForeignKey("supermarkets.id"), primary_key=True
+    )
+    # Category at checkout time; 0 = uncategorized (no FK, part of the key)
+    category_id = Column(Integer, primary_key=True)
+    total_cents = Column(BigInteger, nullable=False)
+    item_count = Column(Integer, nullable=False)  # sum of purchased qty
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class BackgroundJob(Base):
+    """Durable job queue (app/jobs.py), claimed by workers with SKIP LOCKED"""
+
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        # Runnable jobs in due order (the claim query)
+        Index(
+            "ix_background_jobs_run_at",
+            "run_at",
+            postgresql_where=text("failed_at IS NULL"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    # Due time; pushed forward while a worker runs the job and on retry
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    failed_at = Column(DateTime(timezone=True), nullable=True)  # gave up
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -0,0 +1,147 @@
+"""
+Post-commit publish/subscribe shared by all API workers.
+
+Handlers publish inside their database transaction; subscribers are called
+on the event loop once that transaction commits. With the postgres backend
+messages are also sent with NOTIFY, and every worker LISTENs, so
+subscribers in other uvicorn workers receive them too. The local backend
+only reaches the publishing worker (single worker setups, tests).
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.db import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.getenv(
+    "PUBSUB_BACKEND",
+    "postgres" if make_url(DATABASE_URL).get_backend_name() == "postgresql" else "local",
+)
+
+# Identifies this worker, so it can skip its own NOTIFY echoes
+WORKER_ID = uuid.uuid4().hex
+
+Subscriber = Callable[[dict], None]
+
+
+class PubSub:
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+        self._connect_callbacks: List[Callable[[], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        """Register a callback for a channel (call before start())."""
+        self._subscribers[channel].append(callback)
+
+    def on_connect(self, callback: Callable[[], None]) -> None:
+        """
+        Register a callback run each time the listener has (re)started
+        LISTENing: messages sent while it was disconnected are lost, so
+        subscribers that keep state should discard it.
+        """
+        self._connect_callbacks.append(callback)
+
+    def unsubscribe(self, channel: str, callback: Subscriber) -> None:
+        if callback in self._subscribers[channel]:
+            self._subscribers[channel].remove(callback)
+
+    def publish(self, db: Session, channel: str, message: dict) -> None:
+        """
+        Publish a message when db's current transaction commits.
+        Nothing is delivered if the transaction rolls back.
+        """
+        db.info.setdefault("pubsub_pending", []).append((channel, message))
+        if self.backend == "postgres":
+            payload = json.dumps({"origin": WORKER_ID, "message": message})
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": channel, "payload": payload},
+            )
+
+    def dispatch(self, channel: str, message: dict) -> None:
+        """Deliver a message to this worker's subscribers (thread-safe)."""
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._deliver, channel, message)
+        else:
+            self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: dict) -> None:
+        for callback in list(self._subscribers[channel]):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("pubsub subscriber for %s failed", channel)
+
+    async def start(self) -> None:
+        """Bind to the running event loop and start LISTENing (postgres)."""
+        self._loop = asyncio.get_running_loop()
+        if self.backend == "postgres" and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        """LISTEN on all subscribed channels, reconnecting with backoff."""
+        import psycopg
+
+        conninfo = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    conninfo, autocommit=True
+                ) as conn:
+                    for channel in self._subscribers:
+                        await conn.execute(f'LISTEN "{channel}"')
+                    delay = 1
+                    for callback in self._connect_callbacks:
+                        try:
+                            callback()
+                        except Exception:
+                            logger.exception("pubsub connect callback failed")
+                    async for notify in conn.notifies():
+                        payload = json.loads(notify.payload)
+                        if payload.get("origin") != WORKER_ID:
+                            self._deliver(notify.channel, payload["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("pubsub listener disconnected (%s), retrying in %ss", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+
+pubsub = PubSub(PUBSUB_BACKEND)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session) -> None:
+    for channel, message in session.info.pop("pubsub_pending", []):
+        pubsub.dispatch(channel, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("pubsub_pending", None)
@@ -0,0 +1,128 @@
+"""
+Server-Sent Events for live updates.
+
+Handlers publish events on a pubsub channel inside their transaction; after
+commit every worker fans them out to the SSE clients connected to it, so
+clients see each other's changes without polling.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Hashable, Optional, Set
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import models
+from app.pubsub import pubsub
+
+LIST_EVENTS_CHANNEL = "list_events"
+PURCHASE_EVENTS_CHANNEL = "purchase_events"
+
+# Comment line sent on idle connections so proxies don't close them
+HEARTBEAT_SECONDS = 15
+
+# Events buffered per client before it is told to resync instead
+QUEUE_SIZE = 100
+
+
+class EventBroker:
+    """Fans out messages of one pubsub channel to per-connection queues."""
+
+    def __init__(self, channel: str, key: Callable[[dict], Hashable] = lambda message: None):
+        self._key = key
+        self._queues: Dict[Hashable, Set[asyncio.Queue]] = defaultdict(set)
+        pubsub.subscribe(channel, self._on_message)
+
+    def connect(self, key: Hashable = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._queues[key].add(queue)
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue, key: Hashable = None) -> None:
+        self._queues[key].discard(queue)
+        if not self._queues[key]:
+            del self._queues[key]
+
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._queues.values())
+
+    def _on_message(self, message: dict) -> None:
+        for queue in list(self._queues.get(self._key(message), ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog and let it refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+list_events = EventBroker(LIST_EVENTS_CHANNEL, key=lambda message: message["supermarket_id"])
+purchase_events = EventBroker(PURCHASE_EVENTS_CHANNEL)
+
+
+async def _sse_frames(request: Request, broker: EventBroker, key: Hashable) -> AsyncIterator[str]:
+    queue = broker.connect(key)
+    try:
+        yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {json.dumps(message, default=str)}\n\n"
+    finally:
+        broker.disconnect(queue, key)
+
+
+def event_stream(request: Request, broker: EventBroker, key: Hashable = None) -> StreamingResponse:
+    """text/event-stream response delivering the broker's messages for key."""
+    return StreamingResponse(
+        _sse_frames(request, broker, key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def publish_list_event(
+    db: Session,
+    event_type: str,
+    active_list: models.ShoppingList,
+    item: Optional[models.ListItem] = None,
+    **data,
+) -> None:
+    """
+    Announce a list change to clients watching this supermarket's list.
+    Items must have been flushed so they have an id.
+    """
+    message = {
+        "type": event_type,
+        "supermarket_id": active_list.supermarket_id,
+        "list_id": active_list.id,
+        **data,
+    }
+    if item is not None:
+        message["item"] = {
+            "id": item.id,
+            "product_id": item.product_id,
+            "qty": item.qty,
+            "is_checked": item.is_checked,
+        }
+    pubsub.publish(db, LIST_EVENTS_CHANNEL, message)
+
+
+def publish_purchase_event(
+    db: Session, purchase_id: int, supermarket_id: int, total_cents: int
+) -> None:
+    """Announce a completed checkout to clients watching purchases."""
+    pubsub.publish(db, PURCHASE_EVENTS_CHANNEL, {
+        "type": "purchase_completed",
+        "purchase_id": purchase_id,
+        "supermarket_id": supermarket_id,
+        "total_cents": total_cents,
+    })
@@ -0,0 +1,129 @@
+"""
+Spending analytics router.
+"""
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Date, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import get_async_db
+from app import models, schemas
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+
+def add_to_spending_rollups(db: Session, purchase_id: int) -> None:
+    """
+    Add a purchase's items to the monthly spending rollups (one
+    INSERT ... SELECT ... ON CONFLICT), in the caller's transaction so each
+    purchase is counted exactly once.
+    """
+    rollup = models.SpendingRollup
+    month = cast(
+        func.date_trunc("month", func.timezone("UTC", models.Purchase.purchased_at)), Date
+    )
+    category_id = func.coalesce(models.Product.category_id, 0)
+    stmt = pg_insert(rollup).from_select(
+        ["month", "supermarket_id", "category_id", "total_cents", "item_count"],
+        select(
+            month,
+            models.ShoppingList.supermarket_id,
+            category_id,
+            func.sum(models.PurchaseItem.qty * models.PurchaseItem.price_cents_at_purchase),
+            func.sum(models.PurchaseItem.qty),
+        )
+        .select_from(models.PurchaseItem)
+        .join(models.Purchase, models.Purchase.id == models.PurchaseItem.purchase_id)
+        .join(models.ShoppingList, models.ShoppingList.id == models.Purchase.list_id)
+        .join(models.Product, models.Product.id == models.PurchaseItem.product_id)
+        .where(models.PurchaseItem.purchase_id == purchase_id)
+        .group_by(month, models.ShoppingList.supermarket_id, category_id),
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["month", "supermarket_id", "category_id"],
+            set_={
+                "total_cents": rollup.total_cents + stmt.excluded.total_cents,
+                "item_count": rollup.item_count + stmt.excluded.item_count,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+@router.get("/spending", response_model=schemas.SpendingAnalytics)
+async def get_spending(
+    start: Optional[date] = Query(None, description="First month included (any day of it)"),
+    end: Optional[date] = Query(None, description="First month excluded (any day of it)"),
+    supermarket_id: Optional[int] = Query(None, description="Filter by supermarket ID"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Spend per month, per supermarket and per category.
+
+    Served from the spending_rollups table, which checkout keeps current,
+    in one GROUPING SETS query: its size depends on the number of months,
+    supermarkets and categories, not on the purchase history.
+    Months are UTC; categories are those of the products at checkout time.
+    """
+    rollup = models.SpendingRollup
+    query = (
+        select(
+            rollup.month,
+            rollup.supermarket_id,
+            models.Supermarket.name.label("supermarket_name"),
+            rollup.category_id,
+            models.Category.name.label("category_name"),
+            func.sum(rollup.total_cents).label("total_cents"),
+            func.sum(rollup.item_count).label("item_count"),
+        )
+        .join(models.Supermarket, models.Supermarket.id == rollup.supermarket_id)
+        .outerjoin(models.Category, models.Category.id == rollup.category_id)
+        .group_by(
+            func.grouping_sets(
+                tuple_(rollup.month),
+                tuple_(rollup.supermarket_id, models.Supermarket.name),
+                tuple_(rollup.category_id, models.Category.name),
+            )
+        )
+    )
+    if start:
+        start = start.replace(day=1)
+        query = query.where(rollup.month >= start)
+    if end:
+        end = end.replace(day=1)
+        query = query.where(rollup.month < end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if supermarket_id is not None:
+        query = query.where(rollup.supermarket_id == supermarket_id)
+
+    months, supermarkets, categories = [], [], []
+    for row in await db.execute(query):
+        totals = {"total_cents": row.total_cents, "item_count": row.item_count}
+        if row.month is not None:
+            months.append({"month": row.month, **totals})
+        elif row.supermarket_id is not None:
+            supermarkets.append(
+                {"supermarket_id": row.supermarket_id, "name": row.supermarket_name, **totals}
+            )
+        else:
+            categories.append({
+                "category_id": row.category_id or None,
+                "name": row.category_name,
+                **totals,
+            })
+
+    return {
+        "start": start,
+        "end": end,
+        "total_cents": sum(month["total_cents"] for month in months),
+        "item_count": sum(month["item_count"] for month in months),
+        "months": sorted(months, key=lambda month: month["month"]),
+        "supermarkets": sorted(supermarkets, key=lambda s: -s["total_cents"]),
+        "categories": sorted(categories, key=lambda c: -c["total_cents"]),
+    }
@@ -1,22 +1,47 @@
 """
 Categories router.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.db import get_db
+from app.cache import reference_cache
+from app.changelog import record_deletions
+from app.db import get_async_db, get_db
+from app.etag import apply_etag, rows_digest
 from app import models, schemas
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
 
 @router.get("", response_model=List[schemas.Category])
-def get_categories(
-    db: Session = Depends(get_db)
+async def get_categories(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all categories."""
-    categories = db.query(models.Category).order_by(models.Category.name).all()
+    """Get all categories (cached, supports If-None-Match)."""
+    async def load():
+        version = (await db.execute(
+            select(
+                rows_digest(
+                    models.Category.id, models.Category.change_seq, order_by=[models.Category.id]
+                )
+            )
+        )).one()
+        result = await db.execute(select(models.Category).order_by(models.Category.name))
+        categories = [
+            schemas.Category.model_validate(category).model_dump()
+            for category in result.scalars()
+        ]
+        return tuple(version), categories
+
+    version, categories = await reference_cache.get_or_load("categories", load)
+    not_modified = apply_etag(request, response, "categories", *version)
+    if not_modified:
+        return not_modified
     return categories
 
 
@@ -36,6 +61,7 @@ def create_category(
     
     db_category = models.Category(**category.model_dump())
     db.add(db_category)
+    reference_cache.invalidate(db, "categories")
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -57,6 +83,7 @@ def update_category(
     for field, value in update_data.items():
         setattr(db_category, field, value)
     
+    reference_cache.invalidate(db, "categories")
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -81,5 +108,7 @@ def delete_category(
         )
     
     db.delete(db_category)
+    record_deletions(db, "category", [db_category.id])
+    reference_cache.invalidate(db, "categories")
     db.commit()
     return None
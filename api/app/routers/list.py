@@ -2,32 +2,51 @@
 Shopping list router.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from typing import Dict, List, Optional, Tuple
 
-from app.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, lazyload, selectinload
+
+from app.changelog import record_deletions
+from app.db import get_async_db, get_db
+from app.etag import apply_etag, rows_digest
+from app.realtime import event_stream, list_events, publish_list_event
 from app import models, schemas
 
 router = APIRouter(prefix="/api/lists", tags=["lists"])
 
 
 def get_or_create_active_list(
-    db: Session, supermarket_id: int = 1
+    db: Session, supermarket_id: int = 1, with_items: bool = True
 ) -> models.ShoppingList:
-    """Get the active list for a supermarket or create one if it doesn't exist."""
-    active_list = (
-        db.query(models.ShoppingList)
-        .filter(
-            models.ShoppingList.is_active == True,
-            models.ShoppingList.supermarket_id == supermarket_id,
-        )
-        .options(
-            joinedload(models.ShoppingList.items).joinedload(models.ListItem.product),
+    """
+    Get the active list for a supermarket or create one if it doesn't exist.
+    with_items=False skips loading items and supermarket, for handlers that
+    only need the list's id (a single index lookup).
+
+    Creation is race-free: concurrent first requests both INSERT ... ON
+    CONFLICT DO NOTHING against the one-active-list-per-supermarket index
+    and then read back the same list.
+    """
+    query = db.query(models.ShoppingList).filter(
+        models.ShoppingList.is_active == True,
+        models.ShoppingList.supermarket_id == supermarket_id,
+    )
+    if with_items:
+        query = query.options(
+            # Items (ordered by added_at), their products and categories are
+            # loaded in one extra SELECT so serializing the list is N+1 free
+            selectinload(models.ShoppingList.items)
+            .joinedload(models.ListItem.product)
+            .joinedload(models.Product.category),
             joinedload(models.ShoppingList.supermarket),
         )
-        .first()
-    )
+    else:
+        query = query.options(lazyload(models.ShoppingList.items))
+    active_list = query.first()
 
     if not active_list:
         # Get supermarket name for list title
@@ -38,35 +57,94 @@ def get_or_create_active_list(
         )
         list_name = f"{supermarket.name} Einkauf" if supermarket else "Einkauf"
 
-        active_list = models.ShoppingList(
-            name=list_name, is_active=True, supermarket_id=supermarket_id
+        db.execute(
+            pg_insert(models.ShoppingList)
+            .values(name=list_name, is_active=True, supermarket_id=supermarket_id)
+            .on_conflict_do_nothing(
+                index_elements=[models.ShoppingList.supermarket_id],
+                index_where=models.ShoppingList.is_active,
+            )
         )
-        db.add(active_list)
         db.commit()
-        db.refresh(active_list)
+        active_list = query.one()
 
     return active_list
 
 
 @router.get("/active", response_model=schemas.ActiveListResponse)
-def get_active_list(
-    supermarket_id: int = Query(1, ge=1), db: Session = Depends(get_db)
+async def get_active_list(
+    request: Request,
+    response: Response,
+    supermarket_id: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get the current active shopping list with all items.
     Calculates total price based on current product prices.
-    Items are explicitly sorted by added_at to maintain order.
+    Items are sorted by added_at to maintain order.
+
+    Runs in a constant number of queries regardless of list length: one for
+    the list and supermarket, one for items with products and categories.
+
+    Supports If-None-Match: the ETag covers the list, its items and the
+    products, prices, categories and supermarket embedded in the response.
     """
-    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
+    version = (await db.execute(_active_list_version(supermarket_id))).first()
+    if version:
+        not_modified = apply_etag(request, response, "active_list", *version)
+        if not_modified:
+            return not_modified
 
-    # Explicitly load items sorted by added_at to prevent any DB reordering
-    sorted_items = (
-        db.query(models.ListItem)
-        .filter(models.ListItem.list_id == active_list.id)
-        .order_by(models.ListItem.added_at.asc())
-        .all()
+    # Reuse the sync get-or-create logic on the async connection
+    return await db.run_sync(_build_active_list_response, supermarket_id)
+
+
+@router.get("/active/events")
+async def list_events_stream(request: Request, supermarket_id: int = Query(1, ge=1)):
+    """
+    Server-Sent Events stream of changes to the supermarket's active list
+    (item_added, item_updated, item_removed, list_cleared, list_changed,
+    resync). Each event's data is a JSON object with a "type" field.
+    """
+    return event_stream(request, list_events, supermarket_id)
+
+
+def _active_list_version(supermarket_id: int):
+    """Aggregate that changes whenever the active list response would."""
+    return (
+        select(
+            models.ShoppingList.id,
+            models.ShoppingList.updated_at,
+            models.Supermarket.updated_at,
+            rows_digest(
+                models.ListItem.id,
+                models.ListItem.change_seq,
+                models.Product.change_seq,
+                models.Category.change_seq,
+                order_by=[models.ListItem.id],
+            ),
+        )
+        .join(models.Supermarket, models.Supermarket.id == models.ShoppingList.supermarket_id)
+        .outerjoin(models.ListItem, models.ListItem.list_id == models.ShoppingList.id)
+        .outerjoin(models.Product, models.Product.id == models.ListItem.product_id)
+        .outerjoin(models.Category, models.Category.id == models.Product.category_id)
+        .filter(
+            models.ShoppingList.is_active == True,
+            models.ShoppingList.supermarket_id == supermarket_id,
+        )
+        .group_by(
+            models.ShoppingList.id,
+            models.ShoppingList.updated_at,
+            models.Supermarket.updated_at,
+        )
     )
 
+
+def _build_active_list_response(db: Session, supermarket_id: int) -> dict:
+    """Load the active list and build the ActiveListResponse payload."""
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
+    sorted_items = active_list.items
+
     # Calculate total
     total_cents = 0
     for item in sorted_items:
@@ -88,48 +166,212 @@ def get_active_list(
     }
 
 
+def upsert_list_items(
+    db: Session,
+    list_id: int,
+    quantities: Dict[int, int],
+    is_checked: Optional[bool] = None,
+) -> List[Tuple[models.ListItem, bool]]:
+    """
+    Add products to a list in one INSERT ... ON CONFLICT statement.
+
+    quantities maps product_id -> qty to add. Products already on the list
+    have their qty increased. Without is_checked new items are unchecked and
+    existing ones are unchecked too (adding more of a product means it still
+    has to be bought); an explicit is_checked (e.g. replayed offline
+    changes) is stored on new and existing items alike.
+    Returns (item, inserted) pairs.
+    """
+    stmt = pg_insert(models.ListItem).values(
+        [
+            {
+                "list_id": list_id,
+                "product_id": product_id,
+                "qty": qty,
+                "is_checked": bool(is_checked),
+            }
+            for product_id, qty in quantities.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_list_items_list_product",
+        set_={
+            "qty": models.ListItem.qty + stmt.excluded.qty,
+            "is_checked": False if is_checked is None else stmt.excluded.is_checked,
+            "updated_at": func.now(),
+            "change_seq": models.next_change_seq(),
+        },
+    ).returning(models.ListItem, literal_column("xmax = 0").label("inserted"))
+    result = db.execute(stmt, execution_options={"populate_existing": True})
+    return [(item, inserted) for item, inserted in result]
+
+
+def _sum_quantities(items: List[schemas.ListItemCreate]) -> Dict[int, int]:
+    quantities: Dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.qty
+    return quantities
+
+
+def _check_products_exist(db: Session, product_ids) -> None:
+    found = {
+        product_id
+        for (product_id,) in db.query(models.Product.id).filter(
+            models.Product.id.in_(product_ids)
+        )
+    }
+    missing = sorted(set(product_ids) - found)
+    if missing:
+        detail = "Product not found" if len(missing) == 1 else f"Products not found: {missing}"
+        raise HTTPException(status_code=404, detail=detail)
+
+
+def _load_list_items(db: Session, item_ids: List[int]) -> List[models.ListItem]:
+    """Reload items with product and category for the response (one query)."""
+    items = (
+        db.query(models.ListItem)
+        .options(joinedload(models.ListItem.product).joinedload(models.Product.category))
+        .filter(models.ListItem.id.in_(item_ids))
+        .all()
+    )
+    by_id = {item.id: item for item in items}
+    return [by_id[item_id] for item_id in item_ids]
+
+
 @router.post("/active/items", response_model=schemas.ListItem, status_code=201)
 def add_item_to_list(
     item: schemas.ListItemCreate,
     supermarket_id: int = Query(1, ge=1),
     db: Session = Depends(get_db),
 ):
-    """Add an item to the active shopping list."""
-    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
+    """
+    Add an item to the active shopping list.
+    If the product is already on the list its quantity is increased; this
+    is a single atomic upsert, so concurrent adds never create duplicates.
+    """
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
+    _check_products_exist(db, [item.product_id])
 
-    # Check if product exists
-    product = (
-        db.query(models.Product).filter(models.Product.id == item.product_id).first()
-    )
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    [(db_item, inserted)] = upsert_list_items(db, active_list.id, {item.product_id: item.qty})
+    publish_list_event(db, "item_added" if inserted else "item_updated", active_list, db_item)
+    db.commit()
+    return _load_list_items(db, [db_item.id])[0]
 
-    # Check if item already exists on list
-    existing_item = (
-        db.query(models.ListItem)
-        .filter(
-            models.ListItem.list_id == active_list.id,
-            models.ListItem.product_id == item.product_id,
-        )
-        .first()
-    )
 
-    if existing_item:
-        # Increment quantity
-        existing_item.qty += item.qty
-        existing_item.is_checked = False  # Uncheck when adding more
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
+@router.post("/active/items/bulk", response_model=List[schemas.ListItem], status_code=201)
+def add_items_to_list(
+    bulk: schemas.ListItemBulkCreate,
+    supermarket_id: int = Query(1, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Add several products to the active shopping list in one upsert.
+    Repeated product_ids are summed. Returns the resulting list items in
+    order of first appearance in the request.
+    """
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
+    quantities = _sum_quantities(bulk.items)
+    _check_products_exist(db, quantities.keys())
 
-    # Create new item
-    db_item = models.ListItem(
-        list_id=active_list.id, product_id=item.product_id, qty=item.qty
-    )
-    db.add(db_item)
+    upserted = upsert_list_items(db, active_list.id, quantities)
+    item_ids = {item.product_id: item.id for item, _ in upserted}
+    publish_list_event(db, "list_changed", active_list)
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    return _load_list_items(db, [item_ids[product_id] for product_id in quantities])
+
+
+@router.post("/active/batch", response_model=schemas.ListItemBatchResponse)
+def apply_list_batch(
+    batch: schemas.ListItemBatchRequest,
+    supermarket_id: int = Query(1, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Apply several add/update/delete operations to the active list in one
+    transaction (e.g. adding a recipe's ingredients or "check all").
+
+    Runs in a constant number of queries: one list lookup, one SELECT for
+    the referenced items, one for the added products, then the updates, one
+    bulk delete and one upsert for all adds. Updates and deletes refer to
+    items already on the list and are applied before the adds. If any
+    operation is invalid nothing is applied.
+    """
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
+
+    adds = []
+    changes = []
+    for index, operation in enumerate(batch.operations):
+        if operation.op == "add":
+            if operation.product_id is None:
+                raise HTTPException(
+                    status_code=400, detail=f"Operation {index}: 'add' requires product_id"
+                )
+            adds.append(
+                schemas.ListItemCreate(product_id=operation.product_id, qty=operation.qty or 1)
+            )
+        else:
+            if operation.item_id is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Operation {index}: '{operation.op}' requires item_id",
+                )
+            changes.append((index, operation))
+
+    items = {}
+    if changes:
+        items = {
+            item.id: item
+            for item in db.query(models.ListItem).filter(
+                models.ListItem.id.in_({operation.item_id for _, operation in changes})
+            )
+        }
+
+    deleted_ids = []
+    updated = {}
+    for index, operation in changes:
+        db_item = items.get(operation.item_id)
+        if not db_item or operation.item_id in deleted_ids:
+            raise HTTPException(
+                status_code=404, detail=f"Operation {index}: List item not found"
+            )
+        if db_item.list_id != active_list.id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Operation {index}: Item does not belong to active list",
+            )
+        if operation.op == "delete":
+            deleted_ids.append(db_item.id)
+            updated.pop(db_item.id, None)
+            db.expunge(db_item)
+        else:
+            update_data = operation.model_dump(
+                include={"qty", "is_checked"}, exclude_none=True
+            )
+            for field, value in update_data.items():
+                setattr(db_item, field, value)
+            updated[db_item.id] = db_item
+
+    db.flush()
+    if deleted_ids:
+        db.query(models.ListItem).filter(
+            models.ListItem.id.in_(deleted_ids)
+        ).delete(synchronize_session=False)
+        record_deletions(db, "list_item", deleted_ids)
+
+    item_ids = list(updated)
+    if adds:
+        quantities = _sum_quantities(adds)
+        _check_products_exist(db, quantities.keys())
+        for db_item, _ in upsert_list_items(db, active_list.id, quantities):
+            if db_item.id not in updated:
+                item_ids.append(db_item.id)
+
+    publish_list_event(db, "list_changed", active_list)
+    db.commit()
+    return {
+        "items": _load_list_items(db, item_ids) if item_ids else [],
+        "deleted": deleted_ids,
+    }
 
 
 @router.patch("/active/items/{item_id}", response_model=schemas.ListItem)
@@ -146,7 +388,7 @@ def update_list_item(
         raise HTTPException(status_code=404, detail="List item not found")
 
     # Check if item belongs to active list
-    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
     if db_item.list_id != active_list.id:
         raise HTTPException(
             status_code=400, detail="Item does not belong to active list"
@@ -156,6 +398,7 @@ def update_list_item(
     for field, value in update_data.items():
         setattr(db_item, field, value)
 
+    publish_list_event(db, "item_updated", active_list, db_item)
     db.commit()
     db.refresh(db_item)
     return db_item
@@ -172,12 +415,14 @@ def remove_item_from_list(
         raise HTTPException(status_code=404, detail="List item not found")
 
     # Check if item belongs to active list
-    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
     if db_item.list_id != active_list.id:
         raise HTTPException(
             status_code=400, detail="Item does not belong to active list"
         )
 
     db.delete(db_item)
+    record_deletions(db, "list_item", [db_item.id])
+    publish_list_event(db, "item_removed", active_list, item_id=db_item.id)
     db.commit()
     return None
@@ -2,54 +2,218 @@
 Products router.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Date, Integer, case, cast, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import base64
+import json
 import logging
 
-from app.db import get_db
-from app import models, schemas
+from app.db import get_async_db, get_db
+from app import costing, models, schemas
+from app.etag import apply_etag, rows_digest
+from app.jobs import jobs
+from app.streaming import STREAM_BATCH_SIZE, aiter_json_array, stream_json
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 
+def _escape_like(term: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_product_search(query, db, search: str, ranked: bool = True):
+    """
+    Filter a product query (legacy Query or select()) by name and order it
+    by relevance. db may be a Session or an AsyncSession.
+    With ranked=False only the filter is applied (used by keyset pagination,
+    which needs its own stable ordering).
+
+    On PostgreSQL substring and fuzzy matches are served by the pg_trgm
+    GIN index (ix_products_name_trgm): prefix matches rank first, then
+    results are ranked by word similarity, which also tolerates typos.
+    Other dialects (e.g. SQLite in tests) fall back to a plain substring
+    match with prefix matches first.
+    """
+    term = search.strip()
+    escaped = _escape_like(term)
+    name = models.Product.name
+
+    substring_match = name.ilike(f"%{escaped}%", escape="\\")
+    prefix_rank = case((name.ilike(f"{escaped}%", escape="\\"), 1), else_=0)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # "name %> term" is true when word_similarity(term, name) exceeds
+        # pg_trgm.word_similarity_threshold (default 0.6)
+        query = query.filter(or_(substring_match, name.op("%>")(term)))
+        if not ranked:
+            return query
+        return query.order_by(
+            prefix_rank.desc(), func.word_similarity(term, name).desc(), name
+        )
+
+    query = query.filter(substring_match)
+    if not ranked:
+        return query
+    return query.order_by(prefix_rank.desc(), name)
+
+
+def _filter_products(
+    query,
+    category: Optional[int],
+    active: Optional[bool],
+    supermarket_id: Optional[int],
+):
+    """Apply the category/active/supermarket filters shared by product listings."""
+    if category is not None:
+        query = query.filter(models.Product.category_id == category)
+    if active is not None:
+        query = query.filter(models.Product.is_active == active)
+    if supermarket_id is not None:
+        query = query.filter(models.Product.supermarket_id == supermarket_id)
+    return query
+
+
+def encode_cursor(name: str, product_id: int) -> str:
+    """Encode a (name, id) keyset position as an opaque URL-safe cursor."""
+    raw = json.dumps([name, product_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by encode_cursor (raises 400 if malformed)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(name, str) or not isinstance(product_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return name, product_id
+
+
 @router.get("", response_model=List[schemas.Product])
-def get_products(
+async def get_products(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Search in product name"),
     category: Optional[int] = Query(None, description="Filter by category ID"),
     active: Optional[bool] = Query(None, description="Filter by active status"),
     supermarket_id: Optional[int] = Query(None, description="Filter by supermarket ID"),
-    db: Session = Depends(get_db),
+    stream: bool = Query(False, description="Stream the JSON array while rows are fetched"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get products with optional filters.
-    - search: Search in product name (case-insensitive)
+    - search: Ranked, typo-tolerant search in product name (case-insensitive)
     - category: Filter by category ID
     - active: Show only active (true) or inactive (false) products
+    - stream: Serialize rows as they arrive instead of materializing the list
+
+    Supports If-None-Match: the ETag is a digest of every product's and
+    category's change_seq, so it changes whenever one is written. An
+    unchanged catalog costs a 304 and one pass over those two columns
+    instead of loading and serializing the products.
     """
-    query = db.query(models.Product)
+    version = (await db.execute(
+        select(
+            rows_digest(models.Product.id, models.Product.change_seq, order_by=[models.Product.id]),
+            select(
+                rows_digest(
+                    models.Category.id, models.Category.change_seq, order_by=[models.Category.id]
+                )
+            ).scalar_subquery(),
+        )
+    )).one()
+    not_modified = apply_etag(request, response, "products", request.url.query, *version)
+    if not_modified:
+        return not_modified
+
+    query = _filter_products(
+        select(models.Product).options(joinedload(models.Product.category)),
+        category,
+        active,
+        supermarket_id,
+    )
 
-    if search:
-        query = query.filter(models.Product.name.ilike(f"%{search}%"))
+    if search and search.strip():
+        query = apply_product_search(query, db, search)
+    else:
+        query = query.order_by(models.Product.name)
 
-    if category is not None:
-        query = query.filter(models.Product.category_id == category)
+    if stream:
+        result = await db.stream_scalars(
+            query.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        streaming = stream_json(aiter_json_array(result, schemas.Product))
+        streaming.headers.update(response.headers)  # carry the ETag
+        return streaming
 
-    if active is not None:
-        query = query.filter(models.Product.is_active == active)
-    if supermarket_id is not None:
-        query = query.filter(models.Product.supermarket_id == supermarket_id)
+    result = await db.execute(query)
+    return result.scalars().all()
 
-    products = query.order_by(models.Product.name).all()
-    return products
+
+@router.get("/page", response_model=schemas.ProductPage)
+async def get_products_page(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=200, description="Page size"),
+    search: Optional[str] = Query(None, description="Search in product name"),
+    category: Optional[int] = Query(None, description="Filter by category ID"),
+    active: Optional[bool] = Query(None, description="Filter by active status"),
+    supermarket_id: Optional[int] = Query(None, description="Filter by supermarket ID"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get one page of products ordered by (name, id) using keyset pagination.
+    Pass the returned next_cursor to fetch the following page; it is null on
+    the last page. Cost per page is independent of how deep the page is.
+    """
+    query = _filter_products(
+        select(models.Product).options(joinedload(models.Product.category)),
+        category,
+        active,
+        supermarket_id,
+    )
+
+    if search and search.strip():
+        query = apply_product_search(query, db, search, ranked=False)
+
+    if cursor:
+        after_name, after_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(models.Product.name, models.Product.id) > (after_name, after_id)
+        )
+
+    # Fetch one extra row to know whether another page follows
+    query = query.order_by(models.Product.name, models.Product.id).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].name, items[-1].id)
+
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/{product_id}", response_model=schemas.ProductWithPrices)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a single product with price history."""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    result = await db.execute(
+        select(models.Product)
+        .filter(models.Product.id == product_id)
+        .options(
+            joinedload(models.Product.category),
+            selectinload(models.Product.prices),
+        )
+    )
+    product = result.scalars().first()
 
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -57,6 +221,82 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     return product
 
 
+@router.get("/{product_id}/prices/history", response_model=schemas.PriceHistory)
+async def get_price_history(
+    product_id: int,
+    resolution: str = Query("week", pattern="^(day|week|month)$", description="Bucket size"),
+    start: Optional[datetime] = Query(None, description="Range start, UTC unless an offset is given (default: one year before end)"),
+    end: Optional[datetime] = Query(None, description="Range end, exclusive, UTC unless an offset is given (default: now)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Price history downsampled to one point per day, week or month.
+
+    Each bucket carries min/max/average of the prices recorded in it and
+    the last one, aggregated in the database from the
+    (product_id, valid_from) index, so a chart gets one row per bucket
+    instead of every price ever recorded. Buckets without price changes
+    are omitted (the price carries over from the previous bucket).
+    """
+    # Times without an offset are UTC, like the buckets
+    start, end = (
+        value.replace(tzinfo=timezone.utc) if value and value.tzinfo is None else value
+        for value in (start, end)
+    )
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=365)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    price = models.ProductPrice
+    start_price = (
+        select(price.price_cents)
+        .where(price.product_id == product_id, price.valid_from < start)
+        .order_by(price.valid_from.desc(), price.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    product = (await db.execute(
+        select(models.Product.id, start_price).where(models.Product.id == product_id)
+    )).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    bucket = cast(
+        func.date_trunc(resolution, func.timezone("UTC", price.valid_from)), Date
+    ).label("bucket")
+    newest_first = func.array_agg(
+        aggregate_order_by(price.price_cents, price.valid_from.desc(), price.id.desc()),
+        type_=ARRAY(Integer),
+    )
+    rows = await db.execute(
+        select(
+            bucket,
+            func.min(price.price_cents).label("min_cents"),
+            func.max(price.price_cents).label("max_cents"),
+            cast(func.round(func.avg(price.price_cents)), Integer).label("avg_cents"),
+            newest_first[1].label("last_cents"),
+            func.count().label("count"),
+        )
+        .where(
+            price.product_id == product_id,
+            price.valid_from >= start,
+            price.valid_from < end,
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+    return {
+        "product_id": product_id,
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+        "start_price_cents": product[1],
+        "buckets": rows.mappings().all(),
+    }
+
+
 @router.post("", response_model=schemas.Product, status_code=201)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     """Create a new product with optional initial price."""
@@ -78,10 +318,7 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
 
     # Create initial price if provided
     if product.price_cents is not None:
-        db_price = models.ProductPrice(
-            product_id=db_product.id, price_cents=product.price_cents
-        )
-        db.add(db_price)
+        db.add(db_product.record_price(product.price_cents))
 
     db.commit()
     db.refresh(db_product)
@@ -90,7 +327,9 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
 
 @router.patch("/{product_id}", response_model=schemas.Product)
 def update_product(
-    product_id: int, product: schemas.ProductUpdate, db: Session = Depends(get_db)
+    product_id: int,
+    product: schemas.ProductUpdate,
+    db: Session = Depends(get_db),
 ):
     """Update a product (name, category, active status, price, etc)."""
     db_product = (
@@ -112,6 +351,7 @@ def update_product(
 
     # Extract price_cents before updating product
     update_data = product.model_dump(exclude_unset=True)
+    affects_cost = not costing.COST_FIELDS.isdisjoint(update_data)
     price_cents = update_data.pop("price_cents", None)
 
     # Update product fields (except price_cents)
@@ -120,10 +360,11 @@ def update_product(
 
     # Create new price entry if price_cents was provided
     if price_cents is not None:
-        new_price = models.ProductPrice(
-            product_id=db_product.id, price_cents=price_cents, currency="EUR"
-        )
-        db.add(new_price)
+        db.add(db_product.record_price(price_cents))
+
+    # Meal costs depend on price and package, update the meals using it
+    if affects_cost:
+        jobs.enqueue(db, "recost_meals", product_ids=[product_id])
 
     db.commit()
     db.refresh(db_product)
@@ -134,7 +375,9 @@ def update_product(
     "/{product_id}/price", response_model=schemas.ProductPrice, status_code=201
 )
 def add_product_price(
-    product_id: int, price: schemas.ProductPriceCreate, db: Session = Depends(get_db)
+    product_id: int,
+    price: schemas.ProductPriceCreate,
+    db: Session = Depends(get_db),
 ):
     """Add a new price for a product (creates price history entry)."""
     # Check product exists
@@ -144,9 +387,10 @@ def add_product_price(
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Create new price entry
-    db_price = models.ProductPrice(product_id=product_id, price_cents=price.price_cents)
+    # Create new price entry and update the denormalized current price
+    db_price = db_product.record_price(price.price_cents)
     db.add(db_price)
+    jobs.enqueue(db, "recost_meals", product_ids=[product_id])
     db.commit()
     db.refresh(db_price)
     return db_price
@@ -1,96 +1,178 @@
 """
 Purchase/checkout router.
 """
+import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, func, insert, literal, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from datetime import date, datetime
 
-from app.db import get_db
+from app.changelog import record_deletions
+from app.db import get_async_db, get_db
+from app.etag import apply_etag, rows_digest
+from app.jobs import jobs
+from app.realtime import event_stream, publish_list_event, publish_purchase_event, purchase_events
 from app import models, schemas
+from app.routers.analytics import add_to_spending_rollups
 from app.routers.list import get_or_create_active_list
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/purchase", tags=["purchase"])
 
 
+@jobs.handler("create_shopping_event")
+def create_shopping_event(
+    db: Session, purchase_id: int, name: str, event_date: str, total_cents: int
+) -> None:
+    """
+    Job: calendar entry for a checkout, with the purchased items in list
+    order. At most one event per purchase, so retries are no-ops.
+    """
+    event_item = func.jsonb_build_object(
+        "product_id", models.PurchaseItem.product_id,
+        "product_name", models.Product.name,
+        "qty", models.PurchaseItem.qty,
+        "price_cents", models.PurchaseItem.price_cents_at_purchase,
+    )
+    created = db.execute(
+        pg_insert(models.ShoppingEvent)
+        .from_select(
+            ["purchase_id", "name", "event_date", "total_price_cents", "items"],
+            select(
+                literal(purchase_id),
+                literal(name),
+                literal(date.fromisoformat(event_date)),
+                literal(total_cents),
+                func.jsonb_agg(aggregate_order_by(event_item, models.PurchaseItem.id)),
+            )
+            .join_from(models.PurchaseItem, models.Product)
+            .where(models.PurchaseItem.purchase_id == purchase_id)
+            .having(func.count() > 0),
+        )
+        .on_conflict_do_nothing(index_elements=["purchase_id"])
+        .returning(models.ShoppingEvent.id)
+    ).first()
+    if created is not None:
+        logger.info("ShoppingEvent created: %s on %s", name, event_date)
+
+
 @router.post("/checkout", response_model=schemas.Purchase, status_code=201)
 def checkout(supermarket_id: int = Query(1, ge=1), db: Session = Depends(get_db)):
     """
     Complete the current shopping trip.
     - Creates a Purchase record with all current list items
-    - Creates a ShoppingEvent for the calendar
+    - Queues creation of the ShoppingEvent for the calendar
+    - Adds the purchase to the monthly spending rollups
     - Stores prices at time of purchase
     - Clears the active list
     - Returns the completed purchase
-    """
-    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id)
-
-    if not active_list.items:
-        raise HTTPException(status_code=400, detail="Cannot checkout with empty list")
 
-    # Calculate total
-    total_cents = 0
-    purchase_items = []
-    shopping_event_items = []
-
-    for item in active_list.items:
-        price = item.product.current_price or 0
-        total_cents += price * item.qty
+    Runs as set-based SQL in one transaction with a constant number of
+    statements, however long the list: the list row is locked (so
+    concurrent checkouts of the same list cannot both succeed), then one
+    statement deletes the list items and inserts the purchase and its
+    items from exactly the deleted rows, joined with current prices.
+    Being one statement it reads one snapshot, so the total always matches
+    the items, and items added or changed concurrently are either
+    purchased or stay on the list, never removed unpurchased.
+    """
+    active_list = get_or_create_active_list(db, supermarket_id=supermarket_id, with_items=False)
+    db.execute(
+        select(models.ShoppingList.id)
+        .where(models.ShoppingList.id == active_list.id)
+        .with_for_update()
+    )
+    now = datetime.utcnow()
 
-        purchase_items.append(
-            {
-                "product_id": item.product_id,
-                "qty": item.qty,
-                "price_cents_at_purchase": price,
-            }
+    # Clear the active list, keeping what was removed
+    deleted = (
+        delete(models.ListItem)
+        .where(models.ListItem.list_id == active_list.id)
+        .returning(
+            models.ListItem.id,
+            models.ListItem.product_id,
+            models.ListItem.qty,
+            models.ListItem.added_at,
         )
+        .cte("deleted")
+    )
+    purchased = (
+        select(deleted, func.coalesce(models.Product.current_price_cents, 0).label("price"))
+        .join(models.Product, models.Product.id == deleted.c.product_id)
+        .cte("purchased")
+    )
 
-        # Prepare items for shopping event
-        shopping_event_items.append(
-            {
-                "product_id": item.product_id,
-                "product_name": item.product.name,
-                "qty": item.qty,
-                "price_cents": price,
-            }
+    # Create purchase record (no row if the list was empty)
+    new_purchase = (
+        insert(models.Purchase)
+        .from_select(
+            ["list_id", "total_cents", "purchased_at"],
+            select(
+                literal(active_list.id),
+                func.sum(purchased.c.price * purchased.c.qty),
+                literal(now),
+            ).having(func.count() > 0),
         )
-
-    # Create purchase record
-    db_purchase = models.Purchase(
-        list_id=active_list.id, total_cents=total_cents, purchased_at=datetime.utcnow()
+        .returning(models.Purchase.id, models.Purchase.total_cents)
+        .cte("new_purchase")
     )
-    db.add(db_purchase)
-    db.flush()  # Get purchase ID
-
-    # Create purchase items
-    for item_data in purchase_items:
-        db_purchase_item = models.PurchaseItem(purchase_id=db_purchase.id, **item_data)
-        db.add(db_purchase_item)
-
-    # Create shopping event for calendar
-    try:
-        db_shopping_event = models.ShoppingEvent(
-            name=active_list.name,
-            event_date=datetime.utcnow().date(),
-            total_price_cents=total_cents,
-            items=shopping_event_items,
-        )
-        db.add(db_shopping_event)
-        print(
-            f"✅ ShoppingEvent created: {active_list.name} on {datetime.utcnow().date()} with {len(shopping_event_items)} items"
+
+    # Create purchase items with prices at time of purchase
+    new_items = insert(models.PurchaseItem).from_select(
+        ["purchase_id", "product_id", "qty", "price_cents_at_purchase"],
+        select(
+            new_purchase.c.id,
+            purchased.c.product_id,
+            purchased.c.qty,
+            purchased.c.price,
         )
-    except Exception as e:
-        print(f"❌ ERROR creating ShoppingEvent: {e}")
-        import traceback
+        .join(new_purchase, true())
+        .order_by(purchased.c.added_at, purchased.c.id),
+    ).cte("new_items")
 
-        traceback.print_exc()
+    purchase = db.execute(
+        select(
+            new_purchase.c.id,
+            new_purchase.c.total_cents,
+            select(func.array_agg(deleted.c.id)).scalar_subquery().label("item_ids"),
+        ).add_cte(new_items)
+    ).first()
+    if purchase is None:
+        raise HTTPException(status_code=400, detail="Cannot checkout with empty list")
+
+    # Keep the spending analytics current
+    add_to_spending_rollups(db, purchase.id)
 
-    # Clear active list
-    for item in active_list.items:
-        db.delete(item)
+    # Shopping event for the calendar is built after commit, off the request path
+    jobs.enqueue(
+        db,
+        "create_shopping_event",
+        purchase_id=purchase.id,
+        name=active_list.name,
+        event_date=now.date().isoformat(),
+        total_cents=purchase.total_cents,
+    )
+
+    record_deletions(db, "list_item", purchase.item_ids)
+    publish_list_event(db, "list_cleared", active_list, purchase_id=purchase.id)
+    publish_purchase_event(db, purchase.id, active_list.supermarket_id, purchase.total_cents)
 
     db.commit()
-    db.refresh(db_purchase)
+
+    db_purchase = (
+        db.query(models.Purchase)
+        .options(
+            joinedload(models.Purchase.items)
+            .joinedload(models.PurchaseItem.product)
+            .joinedload(models.Product.category)
+        )
+        .filter(models.Purchase.id == purchase.id)
+        .one()
+    )
 
     # Enrich response with supermarket details (from active list)
     # Pydantic model includes supermarket_id and optional supermarket relation
@@ -151,6 +233,90 @@ def get_purchase_history(limit: int = 20, db: Session = Depends(get_db)):
     return result
 
 
+@router.get("/latest/summary", response_model=schemas.PurchaseSummary)
+async def get_latest_purchase_summary(
+    request: Request,
+    response: Response,
+    top: int = Query(10, ge=0, le=100, description="Number of product names to include"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Total, item count, supermarket and first product names of the latest
+    purchase, for pollers that don't need the full history payload.
+
+    Supports If-None-Match: the ETag is computed from one single-row query,
+    so an unchanged summary costs a 304 without loading item names.
+    """
+    latest_id = (
+        select(models.Purchase.id)
+        .order_by(models.Purchase.purchased_at.desc(), models.Purchase.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    summary = (await db.execute(
+        select(
+            models.Purchase.id,
+            models.Purchase.purchased_at,
+            models.Purchase.total_cents,
+            models.Purchase.updated_at,
+            models.ShoppingList.supermarket_id,
+            models.Supermarket.name.label("supermarket_name"),
+            models.Supermarket.updated_at.label("supermarket_updated_at"),
+            func.count(models.PurchaseItem.id).label("items_count"),
+            rows_digest(
+                models.Product.id, models.Product.change_seq, order_by=[models.PurchaseItem.id]
+            ).label("products_version"),
+        )
+        .join(models.ShoppingList, models.ShoppingList.id == models.Purchase.list_id)
+        .outerjoin(models.Supermarket, models.Supermarket.id == models.ShoppingList.supermarket_id)
+        .outerjoin(models.PurchaseItem, models.PurchaseItem.purchase_id == models.Purchase.id)
+        .outerjoin(models.Product, models.Product.id == models.PurchaseItem.product_id)
+        .where(models.Purchase.id == latest_id)
+        .group_by(
+            models.Purchase.id,
+            models.ShoppingList.supermarket_id,
+            models.Supermarket.name,
+            models.Supermarket.updated_at,
+        )
+    )).first()
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No purchases yet")
+
+    not_modified = apply_etag(
+        request, response, "purchase_summary", top,
+        summary.id, summary.updated_at, summary.supermarket_updated_at, summary.products_version,
+    )
+    if not_modified:
+        return not_modified
+
+    names = await db.scalars(
+        select(models.Product.name)
+        .join(models.PurchaseItem, models.PurchaseItem.product_id == models.Product.id)
+        .where(models.PurchaseItem.purchase_id == summary.id)
+        .order_by(models.PurchaseItem.id)
+        .limit(top)
+    )
+    return {
+        "id": summary.id,
+        "purchased_at": summary.purchased_at,
+        "supermarket_id": summary.supermarket_id,
+        "supermarket_name": summary.supermarket_name,
+        "total_cents": summary.total_cents,
+        "items_count": summary.items_count,
+        "products": names.all(),
+    }
+
+
+@router.get("/events")
+async def purchase_events_stream(request: Request):
+    """
+    Server-Sent Events stream announcing completed checkouts
+    (type "purchase_completed" with purchase_id, supermarket_id and
+    total_cents), so pollers can refresh right after a checkout.
+    """
+    return event_stream(request, purchase_events)
+
+
 @router.get("/{purchase_id}", response_model=schemas.Purchase)
 def get_purchase(purchase_id: int, db: Session = Depends(get_db)):
     """Get details of a specific purchase."""
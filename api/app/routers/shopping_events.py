@@ -1,14 +1,14 @@
 """
 Shopping Events router - Track completed shopping trips.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import extract, and_
-from typing import List
+from typing import List, Optional
 from datetime import date
 
 from app.db import get_db
 from app import models, schemas
+from app.streaming import STREAM_BATCH_SIZE, iter_json_array, stream_json
 
 router = APIRouter(prefix="/api/events", tags=["shopping-events"])
 
@@ -37,24 +37,35 @@ def create_shopping_event(
 
 @router.get("/", response_model=List[schemas.ShoppingEvent])
 def list_shopping_events(
-    year: int = None,
-    month: int = None,
+    year: Optional[int] = Query(None, ge=1, le=9998),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    stream: bool = Query(False, description="Stream the JSON array while rows are fetched"),
     db: Session = Depends(get_db)
 ):
     """List shopping events, optionally filtered by year/month."""
     query = db.query(models.ShoppingEvent)
     
+    # Filter on date ranges (not extract()) so the event_date index is used
     if year and month:
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
         query = query.filter(
-            and_(
-                extract('year', models.ShoppingEvent.event_date) == year,
-                extract('month', models.ShoppingEvent.event_date) == month
-            )
+            models.ShoppingEvent.event_date >= start,
+            models.ShoppingEvent.event_date < end
         )
     elif year:
-        query = query.filter(extract('year', models.ShoppingEvent.event_date) == year)
+        query = query.filter(
+            models.ShoppingEvent.event_date >= date(year, 1, 1),
+            models.ShoppingEvent.event_date < date(year + 1, 1, 1)
+        )
     
-    events = query.order_by(models.ShoppingEvent.event_date.desc()).all()
+    query = query.order_by(models.ShoppingEvent.event_date.desc())
+
+    if stream:
+        rows = query.yield_per(STREAM_BATCH_SIZE)
+        return stream_json(iter_json_array(rows, schemas.ShoppingEvent))
+
+    events = query.all()
     return events
 
 
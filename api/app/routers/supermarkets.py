@@ -1,34 +1,60 @@
 """
 API routes for supermarkets.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
 from app import schemas, models
-from app.db import get_db
+from app.cache import reference_cache
+from app.db import get_async_db, get_db
+from app.etag import apply_etag, rows_digest
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[schemas.Supermarket])
-def get_supermarkets(
+async def get_supermarkets(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all supermarkets"""
-    supermarkets = db.query(models.Supermarket).offset(skip).limit(limit).all()
-    return supermarkets
+    """Get all supermarkets (cached, supports If-None-Match)"""
+    async def load():
+        version = (await db.execute(
+            select(
+                rows_digest(
+                    models.Supermarket.id,
+                    models.Supermarket.updated_at,
+                    order_by=[models.Supermarket.id],
+                )
+            )
+        )).one()
+        result = await db.execute(select(models.Supermarket).order_by(models.Supermarket.id))
+        supermarkets = [
+            schemas.Supermarket.model_validate(supermarket).model_dump()
+            for supermarket in result.scalars()
+        ]
+        return tuple(version), supermarkets
+
+    version, supermarkets = await reference_cache.get_or_load("supermarkets", load)
+    not_modified = apply_etag(request, response, "supermarkets", skip, limit, *version)
+    if not_modified:
+        return not_modified
+    return supermarkets[skip:skip + limit]
 
 
 @router.get("/{supermarket_id}", response_model=schemas.Supermarket)
-def get_supermarket(
+async def get_supermarket(
     supermarket_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific supermarket by ID"""
-    supermarket = db.query(models.Supermarket).filter(models.Supermarket.id == supermarket_id).first()
+    supermarket = await db.get(models.Supermarket, supermarket_id)
     if not supermarket:
         raise HTTPException(status_code=404, detail="Supermarket not found")
     return supermarket
@@ -47,6 +73,7 @@ def create_supermarket(
     
     db_supermarket = models.Supermarket(**supermarket.model_dump())
     db.add(db_supermarket)
+    reference_cache.invalidate(db, "supermarkets")
     db.commit()
     db.refresh(db_supermarket)
     return db_supermarket
@@ -68,6 +95,7 @@ def update_supermarket(
     for key, value in update_data.items():
         setattr(db_supermarket, key, value)
     
+    reference_cache.invalidate(db, "supermarkets")
     db.commit()
     db.refresh(db_supermarket)
     return db_supermarket
@@ -94,5 +122,6 @@ def delete_supermarket(
         )
     
     db.delete(db_supermarket)
+    reference_cache.invalidate(db, "supermarkets")
     db.commit()
     return None
@@ -2,26 +2,53 @@
 Sync router for offline synchronization.
 """
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
+from app.changelog import record_deletions
 from app.db import get_db
+from app.realtime import publish_list_event
+from app.routers.list import upsert_list_items
 from app import models, schemas
+from app.streaming import STREAM_BATCH_SIZE, iter_json_array, json_fragment, stream_json
 
 router = APIRouter(prefix="/api/sync", tags=["sync"])
 
 
 @router.get("/since", response_model=schemas.SyncResponse)
 def get_changes_since(
-    ts: str = Query(..., description="ISO 8601 timestamp (e.g., 2024-01-01T12:00:00Z)"),
+    ts: Optional[str] = Query(None, description="ISO 8601 timestamp (e.g., 2024-01-01T12:00:00Z)"),
+    seq: Optional[int] = Query(None, ge=0, description="Change sequence cursor (seq of a previous response)"),
+    stream: bool = Query(False, description="Stream the response while rows are fetched (seq mode)"),
     db: Session = Depends(get_db)
 ):
     """
-    Get all changes since a specific timestamp.
+    Get all changes since a cursor.
     Used by the client to sync offline changes.
-    Returns all entities that were updated after the given timestamp.
+
+    - seq: preferred. Returns rows whose server-assigned change sequence is
+      greater than the cursor (index range scans, immune to clock skew).
+    - ts: legacy. Returns rows with updated_at after the given timestamp.
+
+    Deleted rows are returned as tombstones in `deleted`.
+
+    Change sequence values are allocated when rows are written but become
+    visible in commit order, so the returned cursor is capped at the safe
+    horizon (_safe_change_seq): values above it may still be committed by
+    transactions in flight and are served by a later request.
     """
+    horizon = _safe_change_seq(db)
+    if seq is not None:
+        if stream:
+            return stream_json(_stream_changes_since_seq(db, seq, horizon))
+        return _get_changes_since_seq(db, seq, horizon)
+
+    if ts is None:
+        raise HTTPException(status_code=400, detail="Either seq or ts is required.")
+
     try:
         since_time = datetime.fromisoformat(ts.replace('Z', '+00:00'))
     except ValueError:
@@ -43,23 +70,105 @@ def get_changes_since(
     ).all()
     
     # Get updated list items from active list
-    active_list = db.query(models.ShoppingList).filter(models.ShoppingList.is_active == True).first()
+    active_list = db.query(models.ShoppingList).filter(
+        models.ShoppingList.is_active == True
+    ).order_by(models.ShoppingList.supermarket_id).first()
     list_items = []
     if active_list:
         list_items = db.query(models.ListItem).filter(
             models.ListItem.list_id == active_list.id,
             models.ListItem.updated_at > since_time
         ).all()
+
+    deleted = db.query(models.SyncTombstone).filter(
+        models.SyncTombstone.deleted_at > since_time
+    ).all()
     
     return {
         "categories": categories,
         "products": products,
         "product_prices": prices,
         "list_items": list_items,
-        "timestamp": datetime.utcnow()
+        "deleted": deleted,
+        "timestamp": datetime.utcnow(),
+        "seq": horizon,
+    }
+
+
+def _safe_change_seq(db: Session) -> int:
+    """
+    Highest change_seq at or below which every value is committed (or
+    abandoned), see sync_safe_change_seq() in migration 018. Must be read
+    before the rows: every value up to it was then committed before the row
+    queries take their snapshots.
+    """
+    return db.scalar(select(func.sync_safe_change_seq()))
+
+
+def _changes_since_seq_queries(db: Session, seq: int, horizon: int) -> dict:
+    """Queries for rows written after the cursor up to the horizon (oldest change first)."""
+    def window(column):
+        return column.between(seq + 1, horizon)
+
+    return {
+        "categories": db.query(models.Category).filter(
+            window(models.Category.change_seq)
+        ).order_by(models.Category.change_seq),
+        "products": db.query(models.Product).options(
+            joinedload(models.Product.category)
+        ).filter(
+            window(models.Product.change_seq)
+        ).order_by(models.Product.change_seq),
+        "product_prices": db.query(models.ProductPrice).filter(
+            window(models.ProductPrice.change_seq)
+        ).order_by(models.ProductPrice.change_seq),
+        # Items of all active lists (one per supermarket)
+        "list_items": db.query(models.ListItem).join(
+            models.ShoppingList, models.ShoppingList.id == models.ListItem.list_id
+        ).options(
+            joinedload(models.ListItem.product).joinedload(models.Product.category)
+        ).filter(
+            models.ShoppingList.is_active == True,
+            window(models.ListItem.change_seq)
+        ).order_by(models.ListItem.change_seq),
+        "deleted": db.query(models.SyncTombstone).filter(
+            window(models.SyncTombstone.change_seq)
+        ).order_by(models.SyncTombstone.change_seq),
     }
 
 
+SYNC_SECTION_SCHEMAS = {
+    "categories": schemas.Category,
+    "products": schemas.Product,
+    "product_prices": schemas.ProductPrice,
+    "list_items": schemas.ListItem,
+    "deleted": schemas.SyncTombstone,
+}
+
+
+def _get_changes_since_seq(db: Session, seq: int, horizon: int) -> dict:
+    """Delta sync by change sequence: only rows written after the cursor."""
+    sections = {
+        key: query.all() for key, query in _changes_since_seq_queries(db, seq, horizon).items()
+    }
+    return {
+        **sections,
+        "timestamp": datetime.utcnow(),
+        "seq": max(seq, horizon),
+    }
+
+
+def _stream_changes_since_seq(db: Session, seq: int, horizon: int):
+    """Same payload as _get_changes_since_seq, serialized while rows are fetched."""
+    yield "{"
+    for key, query in _changes_since_seq_queries(db, seq, horizon).items():
+        yield json_fragment(key) + ":"
+        yield from iter_json_array(query.yield_per(STREAM_BATCH_SIZE), SYNC_SECTION_SCHEMAS[key])
+        yield ","
+    cursor = max(seq, horizon)
+    yield '"timestamp":' + json_fragment(datetime.utcnow()) + ',"seq":' + json_fragment(cursor) + "}"
+
+
 @router.post("/changes", status_code=202)
 def apply_changes(
     changes: schemas.SyncChangesRequest,
@@ -70,17 +179,110 @@ def apply_changes(
     Processes a batch of changes (creates, updates, deletes).
     
     Conflict resolution: Last Write Wins (based on timestamp).
+
+    Changes are applied in order against rows prefetched with one query per
+    entity type; creates and updates are written in one flush, deletes in
+    one bulk statement and list item creates in one upsert (adding to the
+    qty of products already on the list), so the number of round trips does
+    not grow with the batch size. Results are returned in the order of the
+    changes.
+
+    Changes carrying a change_id are applied at most once: retries return
+    the stored result of the first application. If the batch fails in the
+    database, it is rolled back to a savepoint and each change is retried
+    under its own savepoint, so one bad change cannot poison the others.
     """
+    applied = _load_applied_changes(db, changes.changes)
+
+    # Retried change_ids replay their stored result, duplicates within the
+    # batch replay the result of their first occurrence
+    results = [None] * len(changes.changes)
+    pending_indexes = []
+    duplicates = {}
+    first_index = {}
+    for index, change in enumerate(changes.changes):
+        if change.change_id in applied:
+            results[index] = {
+                "entity_type": change.entity_type,
+                "status": "success",
+                "result": applied[change.change_id],
+                "replayed": True
+            }
+        elif change.change_id and change.change_id in first_index:
+            duplicates[index] = first_index[change.change_id]
+        else:
+            if change.change_id:
+                first_index[change.change_id] = index
+            pending_indexes.append(index)
+    pending = [changes.changes[index] for index in pending_indexes]
+
+    try:
+        with db.begin_nested():
+            pending_results = _apply_batch(db, pending)
+    except SQLAlchemyError:
+        pending_results = [_apply_single_change(db, change) for change in pending]
+
+    try:
+        _record_applied_changes(db, pending, pending_results)
+        db.commit()
+    except IntegrityError:
+        # Another request applied one of these change_ids concurrently
+        db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Changes are being applied concurrently, retry the request."
+        )
+
+    for index, result in zip(pending_indexes, pending_results):
+        results[index] = result
+    for index, first in duplicates.items():
+        results[index] = {**results[first], "replayed": True}
+    
+    return {
+        "message": "Changes applied",
+        "processed": len(changes.changes),
+        "results": results
+    }
+
+
+def _load_applied_changes(db: Session, changes: List[schemas.SyncChange]) -> dict:
+    """Results of previously applied change_ids in this batch (one query)."""
+    change_ids = {change.change_id for change in changes if change.change_id}
+    if not change_ids:
+        return {}
+    rows = db.query(
+        models.SyncAppliedChange.change_id, models.SyncAppliedChange.result
+    ).filter(models.SyncAppliedChange.change_id.in_(change_ids))
+    return {change_id: result for change_id, result in rows}
+
+
+def _record_applied_changes(db: Session, changes: List[schemas.SyncChange], results: List[dict]) -> None:
+    """Persist idempotency keys of successful changes in the same transaction."""
+    rows = [
+        {
+            "change_id": change.change_id,
+            "entity_type": change.entity_type,
+            "result": result["result"],
+        }
+        for change, result in zip(changes, results)
+        if change.change_id and result["status"] == "success"
+    ]
+    if rows:
+        db.execute(insert(models.SyncAppliedChange), rows)
+
+
+def _apply_batch(db: Session, changes: List[schemas.SyncChange]) -> List[dict]:
+    """Apply changes in order with prefetched rows and a single flush."""
+    batch = _prefetch_batch(db, changes)
     results = []
     
-    for change in changes.changes:
+    for change in changes:
         try:
             if change.entity_type == "list_item":
-                result = _apply_list_item_change(db, change)
+                result = _apply_list_item_change(db, change, batch)
                 results.append({"entity_type": "list_item", "status": "success", "result": result})
             
             elif change.entity_type == "product":
-                result = _apply_product_change(db, change)
+                result = _apply_product_change(db, change, batch)
                 results.append({"entity_type": "product", "status": "success", "result": result})
             
             else:
@@ -97,40 +299,142 @@ def apply_changes(
                 "status": "error",
                 "error": str(e)
             })
-    
-    db.commit()
-    
+
+    _flush_batch(db, batch)
+    return results
+
+
+def _apply_single_change(db: Session, change: schemas.SyncChange) -> dict:
+    """Apply one change under its own savepoint (fallback after a failed batch)."""
+    try:
+        with db.begin_nested():
+            return _apply_batch(db, [change])[0]
+    except SQLAlchemyError as e:
+        return {
+            "entity_type": change.entity_type,
+            "entity_id": change.entity_id,
+            "status": "error",
+            "error": str(getattr(e, "orig", None) or e)
+        }
+
+
+def _prefetch_batch(db: Session, changes: List[schemas.SyncChange]) -> dict:
+    """Load every row referenced by a batch with one query per entity type."""
+    list_item_ids = set()
+    product_ids = set()
+    supermarket_ids = set()
+
+    for change in changes:
+        if change.entity_type == "list_item":
+            if change.operation == "create":
+                supermarket_ids.add(change.supermarket_id)
+                if change.data and change.data.get("product_id") is not None:
+                    product_ids.add(change.data["product_id"])
+            elif change.entity_id is not None:
+                list_item_ids.add(change.entity_id)
+        elif change.entity_type == "product" and change.operation == "update":
+            if change.entity_id is not None:
+                product_ids.add(change.entity_id)
+
+    list_items = {}
+    if list_item_ids:
+        list_items = {
+            item.id: item
+            for item in db.query(models.ListItem).filter(models.ListItem.id.in_(list_item_ids))
+        }
+
+    products = {}
+    if product_ids:
+        products = {
+            product.id: product
+            for product in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+        }
+
+    active_lists = {}
+    if supermarket_ids:
+        active_lists = dict(
+            db.query(models.ShoppingList.supermarket_id, models.ShoppingList.id).filter(
+                models.ShoppingList.is_active == True,
+                models.ShoppingList.supermarket_id.in_(supermarket_ids),
+            )
+        )
+
     return {
-        "message": "Changes applied",
-        "processed": len(changes.changes),
-        "results": results
+        "active_lists": active_lists,  # supermarket_id -> active list id
+        "list_items": list_items,
+        "products": products,
+        "created": [],  # (result dict, new ORM object) pairs awaiting ids
+        "deleted_list_item_ids": [],
+        "list_item_upserts": [],  # (result dict, list_id, product_id, qty, is_checked)
+        "changed_list_ids": set(),
     }
 
 
-def _apply_list_item_change(db: Session, change: schemas.SyncChange):
-    """Apply a change to a list item."""
-    active_list = db.query(models.ShoppingList).filter(models.ShoppingList.is_active == True).first()
-    
-    if not active_list:
-        raise ValueError("No active list found")
-    
+def _flush_batch(db: Session, batch: dict) -> None:
+    """Write the batch: one flush, one bulk delete, one list item upsert."""
+    db.flush()
+
+    for result, obj in batch["created"]:
+        result["id"] = obj.id
+
+    deleted_ids = batch["deleted_list_item_ids"]
+    if deleted_ids:
+        db.query(models.ListItem).filter(
+            models.ListItem.id.in_(deleted_ids)
+        ).delete(synchronize_session=False)
+        record_deletions(db, "list_item", deleted_ids)
+
+    # Creates of products already on the list add to their qty, like
+    # POST /api/lists/active/items, but keep an is_checked the client sent;
+    # one upsert per list and is_checked value
+    upsert_groups = {}
+    for row in batch["list_item_upserts"]:
+        _, list_id, _, _, is_checked = row
+        upsert_groups.setdefault((list_id, is_checked), []).append(row)
+    for (list_id, is_checked), upserts in upsert_groups.items():
+        quantities = {}
+        for _, _, product_id, qty, _ in upserts:
+            quantities[product_id] = quantities.get(product_id, 0) + qty
+        item_ids = {
+            item.product_id: item.id
+            for item, _ in upsert_list_items(db, list_id, quantities, is_checked=is_checked)
+        }
+        for result, _, product_id, _, _ in upserts:
+            result["id"] = item_ids[product_id]
+
+    if batch["changed_list_ids"]:
+        for shopping_list in db.query(models.ShoppingList).filter(
+            models.ShoppingList.id.in_(batch["changed_list_ids"])
+        ):
+            publish_list_event(db, "list_changed", shopping_list)
+
+
+def _apply_list_item_change(db: Session, change: schemas.SyncChange, batch: dict):
+    """Apply a change to a list item (against the prefetched batch rows)."""
     if change.operation == "create":
-        # Create new list item
-        db_item = models.ListItem(
-            list_id=active_list.id,
-            product_id=change.data["product_id"],
-            qty=change.data.get("qty", 1),
-            is_checked=change.data.get("is_checked", False)
-        )
-        db.add(db_item)
-        db.flush()
-        return {"id": db_item.id}
+        list_id = batch["active_lists"].get(change.supermarket_id)
+        if list_id is None:
+            raise ValueError(f"No active list found for supermarket {change.supermarket_id}")
+
+        product_id = change.data["product_id"]
+        if product_id not in batch["products"]:
+            raise ValueError(f"Product {product_id} not found")
+
+        # Upserted when the batch is flushed, which fills in the id
+        result = {"id": None}
+        batch["list_item_upserts"].append((
+            result,
+            list_id,
+            product_id,
+            change.data.get("qty", 1),
+            change.data.get("is_checked"),
+        ))
+        batch["changed_list_ids"].add(list_id)
+        return result
     
     elif change.operation == "update":
         # Update existing item
-        db_item = db.query(models.ListItem).filter(
-            models.ListItem.id == change.entity_id
-        ).first()
+        db_item = batch["list_items"].get(change.entity_id)
         
         if not db_item:
             raise ValueError(f"List item {change.entity_id} not found")
@@ -140,34 +444,34 @@ def _apply_list_item_change(db: Session, change: schemas.SyncChange):
             for key, value in change.data.items():
                 if hasattr(db_item, key):
                     setattr(db_item, key, value)
+            batch["changed_list_ids"].add(db_item.list_id)
         
         return {"id": db_item.id, "updated": True}
     
     elif change.operation == "delete":
-        # Delete item
-        db_item = db.query(models.ListItem).filter(
-            models.ListItem.id == change.entity_id
-        ).first()
+        # Delete item (later changes in the batch no longer see it)
+        db_item = batch["list_items"].pop(change.entity_id, None)
         
         if db_item:
-            db.delete(db_item)
+            db.expunge(db_item)
+            batch["deleted_list_item_ids"].append(db_item.id)
+            batch["changed_list_ids"].add(db_item.list_id)
             return {"id": change.entity_id, "deleted": True}
     
     return {}
 
 
-def _apply_product_change(db: Session, change: schemas.SyncChange):
-    """Apply a change to a product."""
+def _apply_product_change(db: Session, change: schemas.SyncChange, batch: dict):
+    """Apply a change to a product (against the prefetched batch rows)."""
     if change.operation == "create":
         db_product = models.Product(**change.data)
         db.add(db_product)
-        db.flush()
-        return {"id": db_product.id}
+        result = {"id": None}
+        batch["created"].append((result, db_product))
+        return result
     
     elif change.operation == "update":
-        db_product = db.query(models.Product).filter(
-            models.Product.id == change.entity_id
-        ).first()
+        db_product = batch["products"].get(change.entity_id)
         
         if not db_product:
             raise ValueError(f"Product {change.entity_id} not found")
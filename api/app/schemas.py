@@ -126,6 +126,39 @@ class ProductWithPrices(Product):
     prices: ListType[ProductPrice] = []
 
 
+class PriceHistoryBucket(BaseModel):
+    """Prices recorded in one day/week/month (UTC)"""
+
+    bucket: date = Field(..., description="First day of the bucket")
+    min_cents: int
+    max_cents: int
+    avg_cents: int = Field(..., description="Average of the recorded prices")
+    last_cents: int = Field(..., description="Price in effect at the end of the bucket")
+    count: int
+
+
+class PriceHistory(BaseModel):
+    """Response for GET /api/products/{id}/prices/history"""
+
+    product_id: int
+    resolution: str
+    start: datetime
+    end: datetime
+    start_price_cents: Optional[int] = Field(
+        None, description="Price in effect at start (recorded before the range)"
+    )
+    buckets: ListType[PriceHistoryBucket] = []
+
+
+class ProductPage(BaseModel):
+    """Response for GET /api/products/page (keyset pagination)"""
+
+    items: ListType[Product] = []
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor for the next page, null on the last page"
+    )
+
+
 # ============= List Schemas =============
 
 
@@ -166,11 +199,31 @@ class ListItemCreate(ListItemBase):
     pass
 
 
+class ListItemBulkCreate(BaseModel):
+    """Several products to add to the active list in one request"""
+
+    items: ListType[ListItemCreate] = Field(..., min_length=1, max_length=200)
+
+
 class ListItemUpdate(BaseModel):
     qty: Optional[int] = Field(None, ge=1)
     is_checked: Optional[bool] = None
 
 
+class ListItemOperation(BaseModel):
+    """One operation of a list batch: add a product, update or delete an item"""
+
+    op: str = Field(..., pattern="^(add|update|delete)$")
+    product_id: Optional[int] = Field(None, description="Required for 'add'")
+    item_id: Optional[int] = Field(None, description="Required for 'update' and 'delete'")
+    qty: Optional[int] = Field(None, ge=1)
+    is_checked: Optional[bool] = None
+
+
+class ListItemBatchRequest(BaseModel):
+    operations: ListType[ListItemOperation] = Field(..., min_length=1, max_length=500)
+
+
 class ListItem(BaseModel):
     id: int
     list_id: int
@@ -184,6 +237,13 @@ class ListItem(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ListItemBatchResponse(BaseModel):
+    """Items added or updated by a list batch, and ids of deleted items"""
+
+    items: ListType[ListItem]
+    deleted: ListType[int]
+
+
 class ActiveListResponse(ShoppingList):
     """Response for GET /api/lists/active"""
 
@@ -222,6 +282,50 @@ class Purchase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PurchaseSummary(BaseModel):
+    """Compact summary of the latest purchase (Home Assistant sensor)"""
+
+    id: int
+    purchased_at: datetime
+    supermarket_id: int
+    supermarket_name: Optional[str] = None
+    total_cents: int
+    items_count: int
+    products: ListType[str] = Field(..., description="Names of the first N items")
+
+
+class SpendingByMonth(BaseModel):
+    month: date = Field(..., description="First day of the month (UTC)")
+    total_cents: int
+    item_count: int
+
+
+class SpendingBySupermarket(BaseModel):
+    supermarket_id: int
+    name: str
+    total_cents: int
+    item_count: int
+
+
+class SpendingByCategory(BaseModel):
+    category_id: Optional[int] = Field(None, description="null for uncategorized products")
+    name: Optional[str] = None
+    total_cents: int
+    item_count: int
+
+
+class SpendingAnalytics(BaseModel):
+    """Response for GET /api/analytics/spending"""
+
+    start: Optional[date] = None
+    end: Optional[date] = None
+    total_cents: int
+    item_count: int
+    months: ListType[SpendingByMonth] = []
+    supermarkets: ListType[SpendingBySupermarket] = []
+    categories: ListType[SpendingByCategory] = []
+
+
 class CheckoutRequest(BaseModel):
     """Request for POST /api/purchase/checkout"""
 
@@ -234,10 +338,18 @@ class CheckoutRequest(BaseModel):
 class SyncChange(BaseModel):
     """A change from the client to sync"""
 
+    change_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="Client-generated idempotency key; retries with the same key are no-ops",
+    )
     entity_type: str = Field(..., description="E.g., 'list_item', 'product'")
     entity_id: Optional[int] = None
     operation: str = Field(..., description="'create', 'update', 'delete'")
     data: Optional[dict] = None
+    supermarket_id: int = Field(
+        1, ge=1, description="Supermarket whose active list a list_item create is added to"
+    )
     timestamp: datetime
 
 
@@ -245,6 +357,17 @@ class SyncChangesRequest(BaseModel):
     changes: ListType[SyncChange]
 
 
+class SyncTombstone(BaseModel):
+    """A deleted row the client should remove locally"""
+
+    entity_type: str
+    entity_id: int
+    change_seq: int
+    deleted_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class SyncResponse(BaseModel):
     """Response for GET /api/sync/since"""
 
@@ -252,7 +375,11 @@ class SyncResponse(BaseModel):
     products: ListType[Product] = []
     product_prices: ListType[ProductPrice] = []
     list_items: ListType[ListItem] = []
+    deleted: ListType[SyncTombstone] = []
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    seq: Optional[int] = Field(
+        None, description="Cursor for the next ?seq= request (all changes up to it are included)"
+    )
 
 
 # ============= Meal Schemas =============
@@ -0,0 +1,77 @@
+"""
+Streaming JSON serialization for large collection responses.
+"""
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Rows are fetched from the database in batches of this size
+STREAM_BATCH_SIZE = 500
+
+# Serialized fragments are buffered up to this size before being sent
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(rows: Iterable, schema: Type[BaseModel]) -> Iterator[str]:
+    """Serialize ORM rows one by one into the fragments of a JSON array."""
+    yield "["
+    first = True
+    for row in rows:
+        yield ("" if first else ",") + schema.model_validate(row).model_dump_json()
+        first = False
+    yield "]"
+
+
+async def aiter_json_array(rows: AsyncIterable, schema: Type[BaseModel]) -> AsyncIterator[str]:
+    """Async variant of iter_json_array for AsyncSession.stream() results."""
+    yield "["
+    first = True
+    async for row in rows:
+        yield ("" if first else ",") + schema.model_validate(row).model_dump_json()
+        first = False
+    yield "]"
+
+
+def json_fragment(value) -> str:
+    """Serialize a plain value (str, int, datetime, ...) as a JSON fragment."""
+    return json.dumps(value, default=lambda v: v.isoformat())
+
+
+def _chunked(fragments: Iterable[str]) -> Iterator[bytes]:
+    buffer = []
+    size = 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+async def _achunked(fragments: AsyncIterable[str]) -> AsyncIterator[bytes]:
+    buffer = []
+    size = 0
+    async for fragment in fragments:
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def stream_json(fragments) -> StreamingResponse:
+    """
+    Stream JSON fragments (sync or async iterable) as an application/json
+    response. Sync iterables are consumed in the threadpool by Starlette.
+    """
+    if hasattr(fragments, "__aiter__"):
+        body = _achunked(fragments)
+    else:
+        body = _chunked(fragments)
+    return StreamingResponse(body, media_type="application/json")
@@ -0,0 +1,41 @@
+"""
+Benchmark of the meal cost engine over random ingredients.
+
+Usage (from api/): python -m scripts.bench_costing [ingredients]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from app.costing import ingredient_costs
+
+
+def main(count: int) -> None:
+    rng = random.Random(42)
+    units = ["g", "kg", "ml", "l", "stück"]
+    bases = {
+        product_id: SimpleNamespace(
+            price_type=rng.choice(["per_package", "per_kg", "per_100g", "per_liter"]),
+            package_size=rng.choice([None, 250, 500, 1, 1.5]),
+            package_unit=rng.choice([None, "g", "kg", "ml", "l"]),
+            current_price_cents=rng.choice([None, 99, 149, 299, 1299]),
+        )
+        for product_id in range(1, 1001)
+    }
+    ingredients = [
+        (rng.randint(1, 1000), rng.choice([1, 2, 50, 125.5, 250, 1000]), rng.choice(units))
+        for _ in range(count)
+    ]
+
+    started = time.perf_counter()
+    costs = ingredient_costs(ingredients, bases)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{count} ingredients in {elapsed * 1000:.1f} ms "
+        f"({elapsed / count * 1e6:.2f} µs/ingredient), total {sum(costs)} cents"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,90 @@
+"""
+Shared fixtures for the API tests.
+
+The tests run against the PostgreSQL database in DATABASE_URL (the queries
+rely on PostgreSQL features and plans); test modules skip themselves when
+it is unset, before importing the app (app.db requires it at import time).
+The database is migrated to head and the tables below are emptied before
+every test, so DATABASE_URL must point at a throwaway database.
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, text
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+# Emptied before every test; supermarkets (seeded by a migration) are kept
+DATA_TABLES = [
+    "categories", "products", "product_prices", "shopping_lists", "list_items",
+    "purchases", "purchase_items", "meals", "meal_ingredients", "shopping_events",
+    "sync_tombstones", "sync_applied_changes", "spending_rollups", "background_jobs",
+]
+
+
+def alembic_config() -> Config:
+    config = Config(str(API_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(API_DIR / "app" / "migrations"))
+    return config
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set")
+    from app.db import engine
+
+    command.upgrade(alembic_config(), "head")
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    from app.cache import reference_cache
+    from app.db import SessionLocal
+
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(DATA_TABLES)} RESTART IDENTITY CASCADE"))
+    reference_cache.drop("categories")
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def record_queries(engine):
+    """
+    Context manager collecting (statement, parameters) of every query the
+    sync and async engines send while it is active.
+    """
+    from app.db import async_engine
+
+    @contextmanager
+    def recording():
+        queries = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            queries.append((statement, parameters))
+
+        engines = [engine, async_engine.sync_engine]
+        for target in engines:
+            event.listen(target, "before_cursor_execute", record)
+        try:
+            yield queries
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", record)
+
+    return recording
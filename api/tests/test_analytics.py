@@ -0,0 +1,77 @@
+"""
+Tests for the spending analytics router.
+"""
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+
+def add_to_list(client, name, qty, price_cents, supermarket_id=1, category_id=None):
+    product = client.post("/api/products", json={
+        "name": name,
+        "supermarket_id": supermarket_id,
+        "category_id": category_id,
+        "price_cents": price_cents,
+    })
+    assert product.status_code == 201
+    response = client.post(
+        "/api/lists/active/items",
+        params={"supermarket_id": supermarket_id},
+        json={"product_id": product.json()["id"], "qty": qty},
+    )
+    assert response.status_code == 201
+
+
+def checkout(client, supermarket_id):
+    response = client.post("/api/purchase/checkout", params={"supermarket_id": supermarket_id})
+    assert response.status_code == 201
+
+
+@pytest.fixture
+def dairy(client):
+    """Two checkouts: Netto (dairy and uncategorized) and Lidl (dairy)."""
+    response = client.post("/api/categories", json={"name": "Milchprodukte"})
+    assert response.status_code == 201
+    dairy = response.json()["id"]
+    add_to_list(client, "Milch", 2, 119, category_id=dairy)
+    add_to_list(client, "Salz", 1, 50)
+    checkout(client, 1)
+    add_to_list(client, "Joghurt", 3, 59, supermarket_id=2, category_id=dairy)
+    checkout(client, 2)
+    return dairy
+
+
+def totals(groups, key):
+    return [(group[key], group["total_cents"], group["item_count"]) for group in groups]
+
+
+def test_spending_is_grouped_by_month_supermarket_and_category(client, dairy):
+    response = client.get("/api/analytics/spending")
+
+    assert response.status_code == 200
+    spending = response.json()
+    month = datetime.now(timezone.utc).date().replace(day=1).isoformat()
+    assert (spending["total_cents"], spending["item_count"]) == (2 * 119 + 50 + 3 * 59, 6)
+    assert totals(spending["months"], "month") == [(month, 465, 6)]
+    assert totals(spending["supermarkets"], "supermarket_id") == [(1, 288, 3), (2, 177, 3)]
+    assert totals(spending["categories"], "category_id") == [(dairy, 415, 5), (None, 50, 1)]
+
+
+def test_spending_filters_by_supermarket_and_month(client, dairy):
+    lidl = client.get("/api/analytics/spending", params={"supermarket_id": 2}).json()
+    next_year = client.get(
+        "/api/analytics/spending", params={"start": f"{date.today().year + 1}-01-01"}
+    ).json()
+    reversed_range = client.get(
+        "/api/analytics/spending", params={"start": "2026-03-15", "end": "2026-03-01"}
+    )
+
+    assert totals(lidl["categories"], "category_id") == [(dairy, 177, 3)]
+    assert (next_year["total_cents"], next_year["months"]) == (0, [])
+    assert (reversed_range.status_code, reversed_range.json()["detail"]) == (
+        400, "start must be before end"
+    )
@@ -0,0 +1,97 @@
+"""
+Tests for the reference data cache and its invalidation.
+"""
+import asyncio
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text
+
+from app.cache import ReferenceCache
+from app.pubsub import PubSub
+
+
+def load_racing_with(cache, invalidate):
+    """get_or_load whose loader finishes after invalidate() ran."""
+    async def loader():
+        invalidate()
+        return "loaded before the write"
+
+    return asyncio.run(cache.get_or_load("categories", loader))
+
+
+def test_get_or_load_caches_on_miss():
+    cache = ReferenceCache(ttl_seconds=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return "categories"
+
+    assert asyncio.run(cache.get_or_load("categories", loader)) == "categories"
+    assert asyncio.run(cache.get_or_load("categories", loader)) == "categories"
+    assert len(calls) == 1
+
+
+def test_load_racing_with_a_drop_is_not_cached():
+    cache = ReferenceCache(ttl_seconds=60)
+
+    assert load_racing_with(cache, lambda: cache.drop("categories")) == "loaded before the write"
+    assert cache.get("categories") is None
+
+
+def test_load_racing_with_a_clear_is_not_cached():
+    cache = ReferenceCache(ttl_seconds=60)
+
+    load_racing_with(cache, cache.clear)
+    assert cache.get("categories") is None
+
+
+def test_drop_of_another_key_keeps_the_load():
+    cache = ReferenceCache(ttl_seconds=60)
+
+    load_racing_with(cache, lambda: cache.drop("supermarkets"))
+    assert cache.get("categories") == "loaded before the write"
+
+
+def test_categories_write_invalidates_the_cache(client):
+    assert client.get("/api/categories").json() == []
+    client.post("/api/categories", json={"name": "Obst"})
+
+    assert [category["name"] for category in client.get("/api/categories").json()] == ["Obst"]
+
+
+def test_listener_reconnect_runs_connect_callbacks(engine):
+    pubsub = PubSub("postgres")
+    pubsub.subscribe("cache_test", lambda message: None)
+    connects = []
+
+    async def run():
+        pubsub.on_connect(lambda: connects.append(1))
+        await pubsub.start()
+        try:
+            await wait_for(lambda: len(connects) == 1)
+            # Kill the LISTEN connection: the listener reconnects and runs
+            # the callbacks again (invalidations may have been missed)
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"
+                    " WHERE query LIKE 'LISTEN %cache_test%'"
+                ))
+            await wait_for(lambda: len(connects) == 2)
+        finally:
+            await pubsub.stop()
+
+    asyncio.run(run())
+
+
+async def wait_for(condition, timeout=10):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("timed out")
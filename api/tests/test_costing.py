@@ -0,0 +1,87 @@
+"""
+Tests for the meal cost engine.
+"""
+import itertools
+import os
+from types import SimpleNamespace
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app.costing import ingredient_cost, ingredient_costs
+
+PRICE_TYPES = ["per_package", "per_kg", "per_100g", "per_liter", "per_piece"]
+UNITS = ["g", "kg", "ml", "l", "stück"]
+
+
+def legacy_ingredient_cost(product, quantity: float, unit: str) -> int:
+    """calculate_ingredient_cost as it was in routers/meals.py before the table-driven engine."""
+    if not product.current_price_cents:
+        return 0
+
+    def normalize_to_base(qty: float, qty_unit: str) -> float:
+        if qty_unit in ['g']:
+            return qty / 1000
+        elif qty_unit in ['ml']:
+            return qty / 1000
+        else:
+            return qty
+
+    if product.price_type == 'per_package':
+        if not product.package_size:
+            return product.current_price_cents
+        needed_normalized = normalize_to_base(quantity, unit)
+        package_normalized = normalize_to_base(product.package_size, product.package_unit or unit)
+        cost_cents = (needed_normalized / package_normalized) * product.current_price_cents
+        return int(round(cost_cents))
+    elif product.price_type == 'per_kg':
+        qty_in_kg = normalize_to_base(quantity, unit)
+        return int(round(qty_in_kg * product.current_price_cents))
+    elif product.price_type == 'per_100g':
+        if unit == 'g':
+            qty_in_100g = quantity / 100
+        elif unit == 'kg':
+            qty_in_100g = (quantity * 1000) / 100
+        else:
+            qty_in_100g = quantity
+        return int(round(qty_in_100g * product.current_price_cents))
+    elif product.price_type == 'per_liter':
+        qty_in_liters = normalize_to_base(quantity, unit)
+        return int(round(qty_in_liters * product.current_price_cents))
+    return product.current_price_cents
+
+
+PRODUCTS = [
+    SimpleNamespace(
+        price_type=price_type,
+        package_size=package_size,
+        package_unit=package_unit,
+        current_price_cents=price,
+    )
+    for price_type, package_size, package_unit, price in itertools.product(
+        PRICE_TYPES, [None, 1, 1.5, 250, 500], [None, *UNITS], [None, 0, 99, 1299]
+    )
+]
+QUANTITIES = [0, 1, 2, 0.5, 50, 125.5, 250, 1000]
+
+
+@pytest.mark.parametrize("unit", UNITS)
+def test_matches_legacy_cost_for_every_unit_pair(unit):
+    for product, quantity in itertools.product(PRODUCTS, QUANTITIES):
+        expected = legacy_ingredient_cost(product, quantity, unit)
+        assert ingredient_cost(product, quantity, unit) == expected, (vars(product), quantity, unit)
+
+
+def test_batched_costs_match_single_costs():
+    bases = dict(enumerate(PRODUCTS))
+    ingredients = [
+        (product_id, quantity, unit)
+        for product_id, quantity, unit in itertools.product(bases, QUANTITIES, UNITS)
+    ]
+
+    assert ingredient_costs(ingredients, bases) == [
+        ingredient_cost(bases[product_id], quantity, unit)
+        for product_id, quantity, unit in ingredients
+    ]
@@ -0,0 +1,107 @@
+"""
+Tests for ETag / If-None-Match on catalog and list reads.
+"""
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app import models
+from app.db import SessionLocal
+
+
+def create_product(client, name, price_cents=100):
+    response = client.post(
+        "/api/products", json={"name": name, "supermarket_id": 1, "price_cents": price_cents}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+@pytest.mark.parametrize("url", ["/api/lists/active", "/api/products", "/api/categories"])
+def test_unchanged_resource_returns_304(client, url):
+    create_product(client, "Milch")
+    client.get("/api/lists/active")  # creates the list
+
+    etag = client.get(url).headers["ETag"]
+    response = revalidate(client, url, etag)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+
+def test_list_etag_changes_when_an_item_changes(client):
+    product_id = create_product(client, "Milch")
+    client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+    etag = client.get("/api/lists/active").headers["ETag"]
+
+    client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+    response = revalidate(client, "/api/lists/active", etag)
+
+    assert response.status_code == 200
+    assert response.json()["items"][0]["qty"] == 2
+
+
+def test_list_etag_changes_when_updates_commit_out_of_order(client, db):
+    for name in ("Milch", "Brot"):
+        product_id = create_product(client, name)
+        client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+    first, second = db.query(models.ListItem).order_by(models.ListItem.id)
+
+    # The first writer takes the lower change_seq but commits last
+    early, late = SessionLocal(), SessionLocal()
+    try:
+        early.get(models.ListItem, first.id).qty = 5
+        early.flush()
+        late.get(models.ListItem, second.id).qty = 7
+        late.commit()
+        etag = client.get("/api/lists/active").headers["ETag"]
+        early.commit()
+    finally:
+        early.close()
+        late.close()
+
+    response = revalidate(client, "/api/lists/active", etag)
+    assert response.status_code == 200
+    assert [item["qty"] for item in response.json()["items"]] == [5, 7]
+
+
+def test_products_etag_changes_when_updates_commit_out_of_order(client):
+    first, second = create_product(client, "Milch"), create_product(client, "Brot")
+
+    early, late = SessionLocal(), SessionLocal()
+    try:
+        early.get(models.Product, first).name = "Vollmilch"
+        early.flush()
+        late.get(models.Product, second).name = "Roggenbrot"
+        late.commit()
+        etag = client.get("/api/products").headers["ETag"]
+        early.commit()
+    finally:
+        early.close()
+        late.close()
+
+    response = revalidate(client, "/api/products", etag)
+    assert response.status_code == 200
+    assert {product["name"] for product in response.json()} == {"Vollmilch", "Roggenbrot"}
+
+
+def test_purchase_summary_etag_changes_when_a_product_is_renamed(client):
+    product_id = create_product(client, "Milch")
+    client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+    assert client.post("/api/purchase/checkout").status_code == 201
+    etag = client.get("/api/purchase/latest/summary").headers["ETag"]
+    assert revalidate(client, "/api/purchase/latest/summary", etag).status_code == 304
+
+    client.patch(f"/api/products/{product_id}", json={"name": "Vollmilch"})
+    response = revalidate(client, "/api/purchase/latest/summary", etag)
+
+    assert response.status_code == 200
+    assert response.json()["products"] == ["Vollmilch"]
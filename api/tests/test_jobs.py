@@ -0,0 +1,130 @@
+"""
+Tests for the durable (postgres) background job queue.
+
+The queues have no worker threads: tests run the claim loop's steps with
+_run_next_durable() and move run_at to make jobs due.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text
+
+from app import models
+from app.jobs import JOB_LEASE_SECONDS, JobQueue, retry_delay
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue("postgres", workers=0, max_attempts=2)
+    runs = []
+
+    @queue.handler("add_category")
+    def add_category(db, name, failures=0):
+        """Adds a category, failing the first failures runs after doing so."""
+        runs.append(name)
+        db.add(models.Category(name=name))
+        db.flush()
+        if len(runs) <= failures:
+            raise RuntimeError("boom")
+
+    return queue
+
+
+def enqueue(db, queue, **payload):
+    queue.enqueue(db, "add_category", **payload)
+    db.commit()
+    return db.query(models.BackgroundJob).one().id
+
+
+def job_state(db, job_id):
+    """(attempts, seconds until run_at, last_error, failed) of a job."""
+    return db.execute(text("""
+        SELECT attempts, round(extract(epoch FROM run_at - now())), last_error, failed_at IS NOT NULL
+        FROM background_jobs WHERE id = :id
+    """), {"id": job_id}).first()
+
+
+def make_due(db, job_id):
+    db.execute(text("UPDATE background_jobs SET run_at = now() WHERE id = :id"), {"id": job_id})
+    db.commit()
+
+
+def categories(db):
+    db.expire_all()
+    return [category.name for category in db.query(models.Category)]
+
+
+def test_a_failed_job_is_rolled_back_and_retried_later(db, queue):
+    job_id = enqueue(db, queue, name="Obst", failures=1)
+
+    assert queue._run_next_durable() is True
+    assert tuple(job_state(db, job_id)) == (1, retry_delay(1), "RuntimeError('boom')", False)
+    assert categories(db) == []
+    assert queue._run_next_durable() is False  # not due yet
+
+    make_due(db, job_id)
+    assert queue._run_next_durable() is True
+    assert job_state(db, job_id) is None
+    assert categories(db) == ["Obst"]
+    assert {
+        counter: queue.stats()["jobs"]["add_category"][counter]
+        for counter in ("retried", "succeeded", "failed")
+    } == {"retried": 1, "succeeded": 1, "failed": 0}
+
+
+def test_a_job_is_given_up_after_max_attempts(db, queue):
+    job_id = enqueue(db, queue, name="Obst", failures=5)
+
+    queue._run_next_durable()
+    make_due(db, job_id)
+    queue._run_next_durable()
+    make_due(db, job_id)
+
+    assert queue._run_next_durable() is False
+    attempts, _, last_error, failed = job_state(db, job_id)
+    assert (attempts, last_error, failed) == (2, "RuntimeError('boom')", True)
+    assert queue.stats(db)["failed"] == 1
+
+
+def test_a_running_job_is_hidden_from_other_workers(db, queue):
+    job_id = enqueue(db, queue, name="Obst")
+    running, release = threading.Event(), threading.Event()
+
+    @queue.handler("add_category")
+    def add_category_slowly(db, name):
+        running.set()
+        release.wait(10)
+
+    with ThreadPoolExecutor(1) as pool:
+        first = pool.submit(queue._run_next_durable)
+        assert running.wait(10)
+        attempts, seconds_left, _, _ = job_state(db, job_id)
+        db.commit()
+        assert (attempts, seconds_left) == (1, JOB_LEASE_SECONDS)
+        assert JobQueue("postgres", workers=0, max_attempts=2)._run_next_durable() is False
+        release.set()
+        assert first.result() is True
+
+    assert job_state(db, job_id) is None
+
+
+def test_the_job_of_a_dead_worker_is_reclaimed_once_its_lease_expires(db, queue):
+    job_id = enqueue(db, queue, name="Obst")
+    # What a claim leaves behind when its worker dies before finishing
+    db.execute(text(
+        f"UPDATE background_jobs SET attempts = 1, run_at = now() + interval '{JOB_LEASE_SECONDS} seconds'"
+    ))
+    db.commit()
+    assert queue._run_next_durable() is False
+
+    db.execute(text("UPDATE background_jobs SET run_at = now() - interval '1 second'"))
+    db.commit()
+    assert queue._run_next_durable() is True
+    assert job_state(db, job_id) is None
+    assert categories(db) == ["Obst"]
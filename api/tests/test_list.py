@@ -0,0 +1,157 @@
+"""
+Tests for the shopping list router.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from fastapi.testclient import TestClient
+
+from app import models
+
+
+def fill_active_list(db, count):
+    """Replace the active list's items with count products (one category)."""
+    active_list = db.query(models.ShoppingList).filter_by(is_active=True, supermarket_id=1).one()
+    db.query(models.ListItem).filter_by(list_id=active_list.id).delete()
+    category = models.Category(name=f"Category {count}")
+    products = [
+        models.Product(
+            name=f"Product {count}-{number}",
+            category=category,
+            supermarket_id=1,
+            current_price_cents=100 + number,
+        )
+        for number in range(count)
+    ]
+    db.add_all(
+        models.ListItem(list_id=active_list.id, product=product, qty=1) for product in products
+    )
+    db.commit()
+
+
+def test_active_list_query_count_does_not_grow_with_items(client, db, record_queries):
+    assert client.get("/api/lists/active").status_code == 200  # creates the list
+
+    counts = {}
+    for count in (1, 50):
+        fill_active_list(db, count)
+        with record_queries() as queries:
+            response = client.get("/api/lists/active")
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == count
+        counts[count] = len(queries)
+
+    assert counts[1] == counts[50]
+
+
+def create_product(client, name):
+    response = client.post("/api/products", json={"name": name, "supermarket_id": 1})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_adding_a_product_again_increases_its_qty(client):
+    product_id = create_product(client, "Milch")
+
+    first = client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+    client.patch(f"/api/lists/active/items/{first.json()['id']}", json={"is_checked": True})
+    again = client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 2})
+
+    assert first.status_code == again.status_code == 201
+    assert again.json()["id"] == first.json()["id"]
+    assert (again.json()["qty"], again.json()["is_checked"]) == (3, False)
+
+
+def test_concurrent_adds_of_a_product_create_one_item(client):
+    product_id = create_product(client, "Milch")
+    client.get("/api/lists/active")
+    clients = [TestClient(client.app) for _ in range(8)]
+    barrier = threading.Barrier(len(clients))
+
+    def add(other):
+        barrier.wait()
+        return other.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+
+    with ThreadPoolExecutor(len(clients)) as pool:
+        responses = list(pool.map(add, clients))
+
+    assert {response.status_code for response in responses} == {201}
+    [item] = client.get("/api/lists/active").json()["items"]
+    assert item["qty"] == len(clients)
+
+
+def test_bulk_add_sums_repeated_products(client):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot")
+    client.post("/api/lists/active/items", json={"product_id": bread, "qty": 1})
+
+    response = client.post("/api/lists/active/items/bulk", json={"items": [
+        {"product_id": milk, "qty": 1},
+        {"product_id": bread, "qty": 2},
+        {"product_id": milk, "qty": 3},
+    ]})
+
+    assert response.status_code == 201
+    assert [(item["product_id"], item["qty"]) for item in response.json()] == [(milk, 4), (bread, 3)]
+
+
+def list_state(client):
+    items = client.get("/api/lists/active").json()["items"]
+    return {item["id"]: (item["product_id"], item["qty"], item["is_checked"]) for item in items}
+
+
+def test_batch_applies_adds_updates_and_deletes(client):
+    milk, bread, eggs = (create_product(client, name) for name in ("Milch", "Brot", "Eier"))
+    kept = client.post("/api/lists/active/items", json={"product_id": milk}).json()["id"]
+    removed = client.post("/api/lists/active/items", json={"product_id": bread}).json()["id"]
+
+    response = client.post("/api/lists/active/batch", json={"operations": [
+        {"op": "update", "item_id": kept, "qty": 2, "is_checked": True},
+        {"op": "delete", "item_id": removed},
+        {"op": "add", "product_id": eggs, "qty": 6},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json()["deleted"] == [removed]
+    [added] = [item for item in response.json()["items"] if item["product_id"] == eggs]
+    assert list_state(client) == {kept: (milk, 2, True), added["id"]: (eggs, 6, False)}
+
+
+@pytest.mark.parametrize("operation, status, detail", [
+    ({"op": "update", "item_id": 999, "qty": 2}, 404, "Operation 2: List item not found"),
+    ({"op": "add"}, 400, "Operation 2: 'add' requires product_id"),
+    ({"op": "add", "product_id": 999}, 404, "Product not found"),
+])
+def test_batch_with_an_invalid_operation_applies_nothing(client, operation, status, detail):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot")
+    item_id = client.post("/api/lists/active/items", json={"product_id": milk}).json()["id"]
+    before = list_state(client)
+
+    response = client.post("/api/lists/active/batch", json={"operations": [
+        {"op": "delete", "item_id": item_id},
+        {"op": "add", "product_id": bread},
+        operation,
+    ]})
+
+    assert (response.status_code, response.json()["detail"]) == (status, detail)
+    assert list_state(client) == before
+
+
+def test_batch_rejects_items_of_another_list(client):
+    milk = create_product(client, "Milch")
+    other = client.post(
+        "/api/lists/active/items", params={"supermarket_id": 2}, json={"product_id": milk}
+    ).json()["id"]
+
+    response = client.post("/api/lists/active/batch", json={"operations": [
+        {"op": "delete", "item_id": other},
+    ]})
+
+    assert (response.status_code, response.json()["detail"]) == (
+        400, "Operation 0: Item does not belong to active list"
+    )
@@ -0,0 +1,133 @@
+"""
+Tests for the data migrations.
+
+Each test starts from an empty database, migrates down to before the
+migration, seeds the rows it has to merge or backfill from and migrates up.
+"""
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from alembic import command
+from sqlalchemy import text
+
+from conftest import alembic_config
+
+
+@pytest.fixture
+def alembic(db):
+    """Alembic config; the database is migrated back to head afterwards."""
+    config = alembic_config()
+    yield config
+    command.upgrade(config, "head")
+
+
+def seed(engine, *statements):
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def rows(engine, query):
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(query))]
+
+
+PRODUCTS = """
+    INSERT INTO products (name, supermarket_id, price_type, is_active)
+    SELECT 'Product ' || n, 1, 'per_package', true FROM generate_series(1, 3) AS n
+"""
+
+
+def test_013_merges_duplicate_list_items(alembic, engine):
+    command.downgrade(alembic, "012")
+    seed(
+        engine,
+        PRODUCTS,
+        "INSERT INTO shopping_lists (name, supermarket_id, is_active) VALUES ('Einkauf', 1, true)",
+        """
+        INSERT INTO list_items (list_id, product_id, qty, is_checked) VALUES
+            (1, 1, 1, true), (1, 1, 2, false), (1, 1, 4, true),
+            (1, 2, 1, true), (1, 2, 3, true),
+            (1, 3, 5, false)
+        """,
+    )
+
+    command.upgrade(alembic, "013")
+
+    assert rows(engine, "SELECT id, product_id, qty, is_checked FROM list_items ORDER BY id") == [
+        (1, 1, 7, False), (4, 2, 4, True), (6, 3, 5, False),
+    ]
+    assert rows(engine, "SELECT entity_type, entity_id FROM sync_tombstones ORDER BY entity_id") == [
+        ("list_item", 2), ("list_item", 3), ("list_item", 5),
+    ]
+
+
+def test_017_backfills_spending_rollups(alembic, engine):
+    command.downgrade(alembic, "016")
+    seed(
+        engine,
+        "INSERT INTO categories (name) VALUES ('Milchprodukte')",
+        PRODUCTS,
+        "UPDATE products SET category_id = 1 WHERE id IN (1, 2)",
+        """
+        INSERT INTO shopping_lists (name, supermarket_id, is_active) VALUES
+            ('Einkauf', 1, false), ('Einkauf', 2, false)
+        """,
+        """
+        INSERT INTO purchases (list_id, total_cents, purchased_at) VALUES
+            (1, 0, '2026-01-31 23:30+00'), (1, 0, '2026-02-01 00:30+01'), (2, 0, '2026-02-10 12:00+00')
+        """,
+        """
+        INSERT INTO purchase_items (purchase_id, product_id, qty, price_cents_at_purchase) VALUES
+            (1, 1, 2, 100), (1, 3, 1, 50),
+            (2, 2, 1, 300),
+            (3, 1, 3, 110)
+        """,
+    )
+
+    command.upgrade(alembic, "017")
+
+    # The second purchase is 23:30 UTC on January 31st
+    assert rows(engine, """
+        SELECT month::text, supermarket_id, category_id, total_cents, item_count
+        FROM spending_rollups ORDER BY 1, 2, 3
+    """) == [
+        ("2026-01-01", 1, 0, 50, 1),
+        ("2026-01-01", 1, 1, 500, 3),
+        ("2026-02-01", 2, 1, 330, 3),
+    ]
+
+
+def test_014_merges_extra_active_lists_into_the_oldest(alembic, engine):
+    command.downgrade(alembic, "013")
+    seed(
+        engine,
+        PRODUCTS,
+        """
+        INSERT INTO shopping_lists (name, supermarket_id, is_active) VALUES
+            ('Einkauf', 1, true), ('Einkauf', 1, true), ('Einkauf', 1, true), ('Einkauf', 2, true)
+        """,
+        """
+        INSERT INTO list_items (list_id, product_id, qty, is_checked) VALUES
+            (1, 1, 1, false),
+            (2, 1, 2, true), (2, 2, 4, false),
+            (3, 1, 4, true), (3, 3, 5, true),
+            (4, 1, 1, true)
+        """,
+    )
+
+    command.upgrade(alembic, "014")
+
+    assert rows(engine, """
+        SELECT list_id, product_id, qty, is_checked FROM list_items ORDER BY list_id, product_id
+    """) == [
+        (1, 1, 7, False), (1, 2, 4, False), (1, 3, 5, True), (4, 1, 1, True),
+    ]
+    assert rows(engine, "SELECT id FROM shopping_lists WHERE is_active ORDER BY id") == [(1,), (4,)]
+    assert rows(engine, "SELECT entity_type, entity_id FROM sync_tombstones ORDER BY entity_id") == [
+        ("list_item", 2), ("list_item", 3), ("list_item", 4), ("list_item", 5),
+    ]
@@ -0,0 +1,91 @@
+"""
+Tests for the products router.
+"""
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app import models
+
+PRICES = [
+    (datetime(2026, 1, 5, 10, 0), 100),
+    (datetime(2026, 2, 2, 8, 0), 120),  # Monday
+    (datetime(2026, 2, 4, 23, 30), 110),
+    (datetime(2026, 2, 9, 0, 0), 130),  # next Monday
+    (datetime(2026, 3, 1, 0, 0), 999),  # at the (exclusive) end
+]
+
+
+@pytest.fixture
+def product_id(client, db):
+    response = client.post("/api/products", json={"name": "Kaffee", "supermarket_id": 1})
+    assert response.status_code == 201
+    db.add_all(
+        models.ProductPrice(
+            product_id=response.json()["id"],
+            price_cents=price_cents,
+            valid_from=valid_from.replace(tzinfo=timezone.utc),
+        )
+        for valid_from, price_cents in PRICES
+    )
+    db.commit()
+    return response.json()["id"]
+
+
+def history(client, product_id, **params):
+    params = {"start": "2026-02-01T00:00:00", "end": "2026-03-01T00:00:00", **params}
+    response = client.get(f"/api/products/{product_id}/prices/history", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def buckets(history):
+    return [
+        (bucket["bucket"], bucket["min_cents"], bucket["max_cents"],
+         bucket["avg_cents"], bucket["last_cents"], bucket["count"])
+        for bucket in history["buckets"]
+    ]
+
+
+@pytest.mark.parametrize("resolution, expected", [
+    ("day", [
+        ("2026-02-02", 120, 120, 120, 120, 1),
+        ("2026-02-04", 110, 110, 110, 110, 1),
+        ("2026-02-09", 130, 130, 130, 130, 1),
+    ]),
+    ("week", [
+        ("2026-02-02", 110, 120, 115, 110, 2),
+        ("2026-02-09", 130, 130, 130, 130, 1),
+    ]),
+    ("month", [
+        ("2026-02-01", 110, 130, 120, 130, 3),
+    ]),
+])
+def test_price_history_is_bucketed_by_resolution(client, product_id, resolution, expected):
+    result = history(client, product_id, resolution=resolution)
+
+    assert result["start_price_cents"] == 100
+    assert buckets(result) == expected
+
+
+def test_price_history_start_honours_its_offset(client, product_id):
+    # 00:00 at +01:00 is 23:00 UTC the day before, so the 23:30 UTC price is in range
+    result = history(client, product_id, resolution="day", start="2026-02-05T00:00:00+01:00")
+
+    assert result["start_price_cents"] == 120
+    assert [bucket["bucket"] for bucket in result["buckets"]] == ["2026-02-04", "2026-02-09"]
+
+
+def test_price_history_rejects_an_empty_range_and_unknown_products(client, product_id):
+    empty = client.get(
+        f"/api/products/{product_id}/prices/history",
+        params={"start": "2026-03-01T00:00:00", "end": "2026-02-01T00:00:00"},
+    )
+    missing = client.get("/api/products/999/prices/history")
+
+    assert (empty.status_code, empty.json()["detail"]) == (400, "start must be before end")
+    assert (missing.status_code, missing.json()["detail"]) == (404, "Product not found")
@@ -0,0 +1,88 @@
+"""
+Tests for the purchase/checkout router.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from fastapi.testclient import TestClient
+
+from app import models
+
+
+def add_to_list(client, name, qty, price_cents=None, supermarket_id=1):
+    product = client.post(
+        "/api/products",
+        json={"name": name, "supermarket_id": supermarket_id, "price_cents": price_cents},
+    )
+    assert product.status_code == 201
+    response = client.post(
+        "/api/lists/active/items",
+        params={"supermarket_id": supermarket_id},
+        json={"product_id": product.json()["id"], "qty": qty},
+    )
+    assert response.status_code == 201
+    return product.json()["id"]
+
+
+def test_checkout_of_an_empty_list_is_rejected(client, db):
+    response = client.post("/api/purchase/checkout")
+
+    assert (response.status_code, response.json()["detail"]) == (
+        400, "Cannot checkout with empty list"
+    )
+    assert db.query(models.Purchase).count() == 0
+
+
+def test_checkout_purchases_the_list_at_current_prices(client, db):
+    milk = add_to_list(client, "Milch", 2, price_cents=119)
+    bread = add_to_list(client, "Brot", 1, price_cents=249)
+    salt = add_to_list(client, "Salz", 3)
+
+    response = client.post("/api/purchase/checkout")
+
+    assert response.status_code == 201
+    purchase = response.json()
+    assert purchase["total_cents"] == 2 * 119 + 249
+    assert [
+        (item["product_id"], item["qty"], item["price_cents_at_purchase"])
+        for item in purchase["items"]
+    ] == [(milk, 2, 119), (bread, 1, 249), (salt, 3, 0)]
+    assert client.get("/api/lists/active").json()["items"] == []
+    job = db.query(models.BackgroundJob).filter_by(name="create_shopping_event").one()
+    assert job.payload["purchase_id"] == purchase["id"]
+
+
+def test_checkout_only_clears_its_supermarkets_list(client):
+    add_to_list(client, "Milch", 1, price_cents=119)
+    add_to_list(client, "Joghurt", 1, price_cents=59, supermarket_id=2)
+
+    response = client.post("/api/purchase/checkout", params={"supermarket_id": 2})
+
+    assert response.status_code == 201
+    assert response.json()["total_cents"] == 59
+    assert len(client.get("/api/lists/active").json()["items"]) == 1
+
+
+def test_concurrent_checkouts_of_a_list_purchase_it_once(client, db):
+    add_to_list(client, "Milch", 2, price_cents=119)
+    add_to_list(client, "Brot", 1, price_cents=249)
+    clients = [TestClient(client.app) for _ in range(4)]
+    barrier = threading.Barrier(len(clients))
+
+    def checkout(other):
+        barrier.wait()
+        return other.post("/api/purchase/checkout")
+
+    with ThreadPoolExecutor(len(clients)) as pool:
+        responses = list(pool.map(checkout, clients))
+
+    assert sorted(response.status_code for response in responses) == [201, 400, 400, 400]
+    [purchase] = db.query(models.Purchase).all()
+    assert purchase.total_cents == 2 * 119 + 249
+    assert len(purchase.items) == 2
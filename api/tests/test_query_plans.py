@@ -0,0 +1,88 @@
+"""
+Query plan regression tests for the history indexes (migration 015).
+
+With a realistic amount of history the queries behind the history
+endpoints must be answered from their indexes, not by scanning the table.
+"""
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text
+
+# Tables that grow with the history and must not be scanned sequentially
+HISTORY_TABLES = {"purchases", "shopping_events", "product_prices"}
+
+SEED = [
+    """
+    INSERT INTO shopping_lists (name, is_active, supermarket_id)
+    VALUES ('Einkauf', false, 1)
+    """,
+    """
+    INSERT INTO purchases (list_id, purchased_at, total_cents)
+    SELECT 1, now() - n * interval '2 hours', n
+    FROM generate_series(1, 20000) AS n
+    """,
+    """
+    INSERT INTO shopping_events (name, event_date, total_price_cents, items)
+    SELECT 'Einkauf', current_date - n / 10, n, '[]'
+    FROM generate_series(1, 20000) AS n
+    """,
+    """
+    INSERT INTO products (name, supermarket_id, current_price_cents, is_active)
+    SELECT 'Product ' || n, 1, 100, true FROM generate_series(1, 200) AS n
+    """,
+    """
+    INSERT INTO product_prices (product_id, price_cents, currency, valid_from)
+    SELECT product_id, 100 + n, 'EUR', now() - n * interval '1 day'
+    FROM generate_series(1, 200) AS product_id, generate_series(1, 100) AS n
+    """,
+    "ANALYZE shopping_lists, purchases, shopping_events, products, product_prices",
+]
+
+
+@pytest.fixture
+def history(db):
+    for statement in SEED:
+        db.execute(text(statement))
+    db.commit()
+
+
+def scanned_relations(plan):
+    """(node type, relation) of every scan in an EXPLAIN (FORMAT JSON) plan."""
+    if "Relation Name" in plan:
+        yield plan["Node Type"], plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from scanned_relations(child)
+
+
+def explain_scans(engine, queries):
+    """Scans of the SELECTs among recorded (statement, parameters) queries."""
+    scans = set()
+    with engine.connect() as conn:
+        for statement, parameters in queries:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            [[result]] = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            scans.update(scanned_relations(result[0]["Plan"]))
+    return scans
+
+
+@pytest.mark.parametrize("url, table", [
+    ("/api/purchase/history?limit=20", "purchases"),
+    ("/api/events/?year=2025&month=6", "shopping_events"),
+    ("/api/products/42", "product_prices"),
+])
+def test_history_queries_use_indexes(client, engine, record_queries, history, url, table):
+    with record_queries() as queries:
+        assert client.get(url).status_code == 200
+
+    scans = explain_scans(engine, queries)
+    assert table in {relation for _, relation in scans}
+    assert not {
+        relation for node, relation in scans
+        if node == "Seq Scan" and relation in HISTORY_TABLES
+    }
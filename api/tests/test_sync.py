@@ -0,0 +1,229 @@
+"""
+Tests for the offline sync endpoints.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app import models
+from app.db import SessionLocal
+
+
+def create_product(client, name, supermarket_id=1):
+    response = client.post("/api/products", json={"name": name, "supermarket_id": supermarket_id})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def change(entity_type, operation, entity_id=None, supermarket_id=1, **data):
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "operation": operation,
+        "data": data or None,
+        "supermarket_id": supermarket_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def push(client, *changes):
+    response = client.post("/api/sync/changes", json={"changes": list(changes)})
+    assert response.status_code == 202
+    return response.json()["results"]
+
+
+def active_items(client, supermarket_id=1):
+    items = client.get("/api/lists/active", params={"supermarket_id": supermarket_id}).json()["items"]
+    return {item["product_id"]: item for item in items}
+
+
+def test_offline_create_as_checked_keeps_is_checked_for_existing_item(client):
+    product_id = create_product(client, "Milch")
+    client.post("/api/lists/active/items", json={"product_id": product_id, "qty": 1})
+
+    [result] = push(client, change("list_item", "create", product_id=product_id, qty=2, is_checked=True))
+
+    assert result["status"] == "success"
+    item = active_items(client)[product_id]
+    assert item["id"] == result["result"]["id"]
+    assert (item["qty"], item["is_checked"]) == (3, True)
+
+
+def test_offline_create_without_is_checked_unchecks_existing_item(client):
+    product_id = create_product(client, "Milch")
+    item_id = client.post(
+        "/api/lists/active/items", json={"product_id": product_id, "qty": 1}
+    ).json()["id"]
+    client.patch(f"/api/lists/active/items/{item_id}", json={"is_checked": True})
+
+    push(client, change("list_item", "create", product_id=product_id))
+
+    item = active_items(client)[product_id]
+    assert (item["qty"], item["is_checked"]) == (2, False)
+
+
+def test_offline_creates_go_to_their_supermarkets_active_list(client):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot", supermarket_id=2)
+    client.get("/api/lists/active", params={"supermarket_id": 1})
+    client.get("/api/lists/active", params={"supermarket_id": 2})
+
+    results = push(
+        client,
+        change("list_item", "create", product_id=milk),
+        change("list_item", "create", product_id=bread, supermarket_id=2),
+        change("list_item", "create", product_id=bread, supermarket_id=3),
+    )
+
+    assert [result["status"] for result in results] == ["success", "success", "error"]
+    assert "supermarket 3" in results[2]["error"]
+    assert list(active_items(client, 1)) == [milk]
+    assert list(active_items(client, 2)) == [bread]
+
+
+def tombstones(client):
+    deleted = client.get("/api/sync/since", params={"seq": 0}).json()["deleted"]
+    return {(tombstone["entity_type"], tombstone["entity_id"]) for tombstone in deleted}
+
+
+def test_deletes_reach_the_feed_as_tombstones(client):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot")
+    removed = client.post("/api/lists/active/items", json={"product_id": milk}).json()["id"]
+    purchased = client.post("/api/lists/active/items", json={"product_id": bread}).json()["id"]
+    category_id = client.post("/api/categories", json={"name": "Obst"}).json()["id"]
+
+    client.delete(f"/api/lists/active/items/{removed}")
+    client.post("/api/purchase/checkout")
+    client.delete(f"/api/categories/{category_id}")
+
+    assert tombstones(client) == {
+        ("list_item", removed), ("list_item", purchased), ("category", category_id)
+    }
+
+
+def test_meal_deletes_write_no_tombstones(client):
+    product_id = create_product(client, "Milch")
+    meal = client.post("/api/meals", json={
+        "name": "Porridge",
+        "meal_type": "breakfast",
+        "ingredients": [{"product_id": product_id, "quantity": 250, "quantity_unit": "ml"}],
+    }).json()
+    client.patch(f"/api/meals/{meal['id']}", json={"ingredients": []})
+    client.delete(f"/api/meals/{meal['id']}")
+
+    assert tombstones(client) == set()
+
+
+def changes_since(client, seq):
+    response = client.get("/api/sync/since", params={"seq": seq})
+    assert response.status_code == 200
+    return response.json()
+
+
+@contextmanager
+def renamed_out_of_order(first, second):
+    """
+    Rename product first in a transaction that takes its change_seq before
+    the rename of second commits. Yields that still open session.
+    """
+    early, late = SessionLocal(), SessionLocal()
+    try:
+        early.get(models.Product, first).name = "Vollmilch"
+        early.flush()
+        late.get(models.Product, second).name = "Roggenbrot"
+        late.commit()
+        yield early
+    finally:
+        early.close()
+        late.close()
+
+
+def test_seq_cursor_does_not_pass_writes_still_in_flight(client):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot")
+    cursor = changes_since(client, 0)["seq"]
+
+    with renamed_out_of_order(milk, bread) as early:
+        # bread's rename is committed but has the higher seq: it is withheld
+        # until the earlier write commits, which would otherwise be skipped
+        pending = changes_since(client, cursor)
+        assert (pending["seq"], pending["products"]) == (cursor, [])
+        early.commit()
+
+    changes = changes_since(client, cursor)
+    assert {product["name"] for product in changes["products"]} == {"Vollmilch", "Roggenbrot"}
+    assert changes["seq"] > cursor
+    assert changes_since(client, changes["seq"])["products"] == []
+
+
+def test_seq_cursor_passes_rolled_back_writes(client):
+    milk, bread = create_product(client, "Milch"), create_product(client, "Brot")
+    cursor = changes_since(client, 0)["seq"]
+
+    with renamed_out_of_order(milk, bread) as early:
+        early.rollback()
+
+    changes = changes_since(client, cursor)
+    assert [product["name"] for product in changes["products"]] == ["Roggenbrot"]
+
+
+def test_streamed_changes_match_the_json_response(client):
+    create_product(client, "Milch")
+    client.post("/api/categories", json={"name": "Obst"})
+
+    streamed = client.get("/api/sync/since", params={"seq": 0, "stream": True}).json()
+    changes = changes_since(client, 0)
+
+    for body in (streamed, changes):
+        del body["timestamp"]
+    assert streamed == changes
+
+
+def test_retried_change_id_is_applied_once(client):
+    product_id = create_product(client, "Milch")
+    client.get("/api/lists/active")
+    create = {**change("list_item", "create", product_id=product_id), "change_id": "add-milk"}
+
+    [first] = push(client, create)
+    [retry] = push(client, create)
+
+    assert retry == {**first, "replayed": True}
+    assert active_items(client)[product_id]["qty"] == 1
+
+
+def test_duplicate_change_id_in_a_batch_is_applied_once(client):
+    product_id = create_product(client, "Milch")
+    client.get("/api/lists/active")
+    create = {**change("list_item", "create", product_id=product_id), "change_id": "add-milk"}
+
+    first, duplicate = push(client, create, create)
+
+    assert duplicate == {**first, "replayed": True}
+    assert active_items(client)[product_id]["qty"] == 1
+
+
+def test_database_error_fails_only_its_own_change(client):
+    product_id = create_product(client, "Milch")
+    client.get("/api/lists/active")
+    # supermarket_id is a keyword of change() itself, so pass data directly
+    bad = {
+        **change("product", "create"),
+        "data": {"name": "Brot", "supermarket_id": 999},
+        "change_id": "bad",
+    }
+
+    added, failed = push(
+        client,
+        {**change("list_item", "create", product_id=product_id), "change_id": "good"},
+        bad,
+    )
+
+    assert added["status"] == "success"
+    assert failed["status"] == "error" and "foreign key" in failed["error"]
+    assert active_items(client)[product_id]["qty"] == 1
+    # Failed changes are not recorded, so a corrected retry is applied
+    [retry] = push(client, {**bad, "data": {"name": "Brot", "supermarket_id": 1}})
+    assert retry["status"] == "success" and "replayed" not in retry
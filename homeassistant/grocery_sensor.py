@@ -1,12 +1,18 @@
 """
 AppDaemon Grocery Sensor - FD-safe implementation
-Polls grocery API every 60s and updates Home Assistant sensor
+Listens for checkouts on the grocery API's event stream and updates the
+Home Assistant sensor; falls back to polling every 60s while disconnected
 """
 
 import appdaemon.plugins.hass.hassapi as hass
 import requests
+import threading
 from datetime import datetime
 
+POLL_INTERVAL = 60  # seconds, only while the event stream is down
+STREAM_READ_TIMEOUT = 45  # the API sends a keepalive every 15s
+MAX_BACKOFF = 300  # seconds between stream reconnect attempts
+
 
 class GrocerySensor(hass.Hass):
     """Fetch latest grocery purchase and update HA sensor."""
@@ -15,6 +21,7 @@ class GrocerySensor(hass.Hass):
         """Setup session and start polling."""
         self.api_url = self.args.get("api_url", "http://192.168.178.123:8082/api")
         self.session = requests.Session()
+        self.etag = None  # ETag of the last summary, for If-None-Match
         self.session.headers.update(
             {
                 "User-Agent": "HomeAssistant-GrocerySensor/1.0",
@@ -22,52 +29,105 @@ class GrocerySensor(hass.Hass):
             }
         )
 
+        self.stream_connected = False
+        self.stopping = threading.Event()
+        self.stream_thread = None
+
         # Delayed start to avoid startup congestion
         self.run_in(self.start_polling, 5)
         self.log("GrocerySensor initialized, starting in 5s")
 
     def start_polling(self, kwargs):
-        """Start periodic polling."""
-        self.run_every(self.fetch_grocery_data, "now", 60)
-        self.log("Polling started (60s interval)")
+        """Start the event stream listener and the fallback polling."""
+        self.stream_thread = threading.Thread(
+            target=self.consume_stream, name="grocery-sensor-stream", daemon=True
+        )
+        self.stream_thread.start()
+        self.run_every(self.poll_if_disconnected, "now", POLL_INTERVAL)
+        self.log(f"Started (push stream, polling every {POLL_INTERVAL}s while disconnected)")
+
+    def poll_if_disconnected(self, kwargs):
+        """Fallback polling, skipped while the event stream is connected."""
+        if not self.stream_connected:
+            self.fetch_grocery_data(kwargs)
+
+    def consume_stream(self):
+        """
+        Listen to /purchase/events (Server-Sent Events) and refresh the
+        sensor on every checkout. Reconnects with exponential backoff.
+        Runs in its own thread with its own session (Sessions aren't
+        thread-safe).
+        """
+        backoff = 1
+        with requests.Session() as session:
+            session.headers.update(
+                {
+                    "User-Agent": "HomeAssistant-GrocerySensor/1.0",
+                    "Accept": "text/event-stream",
+                }
+            )
+            while not self.stopping.is_set():
+                try:
+                    with session.get(
+                        f"{self.api_url}/purchase/events",
+                        stream=True,
+                        timeout=(5, STREAM_READ_TIMEOUT),
+                    ) as response:
+                        response.raise_for_status()
+                        self.stream_connected = True
+                        backoff = 1
+                        self.log("Event stream connected")
+
+                        # Catch up on checkouts missed while disconnected
+                        self.run_in(self.fetch_grocery_data, 0)
+                        for line in response.iter_lines(decode_unicode=True):
+                            if self.stopping.is_set():
+                                break
+                            if line and line.startswith("data:"):
+                                self.run_in(self.fetch_grocery_data, 0)
+                except requests.RequestException as e:
+                    if not self.stopping.is_set():
+                        self.log(f"Event stream error: {e}", level="WARNING")
+                finally:
+                    self.stream_connected = False
+
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
 
     def fetch_grocery_data(self, kwargs):
-        """Fetch latest purchase from API and update sensor."""
+        """Fetch latest purchase summary from API and update sensor."""
         try:
+            # Conditional request: unchanged summary costs a 304 without body
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+
             # HTTP request with timeout
             response = self.session.get(
-                f"{self.api_url}/purchase/history?limit=1",
+                f"{self.api_url}/purchase/latest/summary?top=10",
+                headers=headers,
                 timeout=(5, 15),  # connect, read timeout
             )
-            response.raise_for_status()
-            data = response.json()
-
-            if not data or len(data) == 0:
+            if response.status_code == 304:
+                return
+            if response.status_code == 404:
                 self.log("No purchase data available", level="WARNING")
                 return
+            response.raise_for_status()
+            summary = response.json()
+            self.etag = response.headers.get("ETag")
 
-            # Get latest purchase
-            purchase = data[0]
-
-            # Calculate total price
-            total_cents = sum(
-                item.get("price_cents_at_purchase", 0) * item.get("qty", 1)
-                for item in purchase.get("items", [])
-            )
+            total_cents = summary.get("total_cents", 0)
 
             # Format state (ISO timestamp)
-            state = purchase.get("purchased_at", "unknown")
+            state = summary.get("purchased_at", "unknown")
 
             # Build attributes
             attributes = {
-                "supermarket_id": purchase.get("supermarket_id", "unknown"),
-                "items_count": len(purchase.get("items", [])),
+                "supermarket_id": summary.get("supermarket_id", "unknown"),
+                "supermarket_name": summary.get("supermarket_name"),
+                "items_count": summary.get("items_count", 0),
                 "total_price_cents": total_cents,
                 "total_price_euro": round(total_cents / 100, 2),
-                "products": [
-                    item.get("product", {}).get("name", "unknown")
-                    for item in purchase.get("items", [])[:10]  # Top 10
-                ],
+                "products": summary.get("products", []),  # Top 10
                 "last_update": datetime.now().isoformat(),
             }
 
@@ -77,7 +137,7 @@ class GrocerySensor(hass.Hass):
             )
 
             self.log(
-                f"✓ Updated: {len(purchase.get('items', []))} items, {attributes['total_price_euro']}€"
+                f"✓ Updated: {attributes['items_count']} items, {attributes['total_price_euro']}€"
             )
 
         except requests.Timeout:
@@ -88,7 +148,9 @@ class GrocerySensor(hass.Hass):
             self.log(f"Unexpected error: {e}", level="ERROR")
 
     def terminate(self):
-        """Cleanup session on shutdown."""
+        """Stop the stream listener and cleanup session on shutdown."""
+        if hasattr(self, "stopping"):
+            self.stopping.set()
         if hasattr(self, "session") and self.session:
             self.session.close()
             self.log("Session closed")
@@ -98,5 +160,6 @@ class GrocerySensor(hass.Hass):
 # - Öffnet Netzwerk? ja (HTTP)
 # - Session wiederverwendet? ja
 # - Subprocess? nein
-# - Empfohlenes Intervall: 60s (konfiguriert)
+# - Thread? ja, 1 Daemon-Thread für den Event-Stream (eigene Session, endet bei terminate)
+# - Empfohlenes Intervall: Push; 60s Polling nur ohne Stream-Verbindung
 # - Cleanup vorhanden? ja (terminate)
@@ -1,5 +1,5 @@
-import { useMemo, useState } from 'react'
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { useEffect, useMemo, useState } from 'react'
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import api from './lib/api'
 import ListPane from './components/ListPane'
 import CatalogPane from './components/CatalogPane'
@@ -9,6 +9,9 @@ import CalendarModal from './components/CalendarModal'
 import Toast from './components/Toast'
 import { useSupermarkets } from './hooks/useSupermarkets'
 
+// Produkte pro Seite beim seitenweisen Laden des Katalogs
+const PRODUCT_PAGE_SIZE = 200
+
 function App() {
   const queryClient = useQueryClient()
   const [isSettingsOpen, setIsSettingsOpen] = useState(false)
@@ -27,19 +30,57 @@ function App() {
   const defaultMarketId = useMemo(() => supermarkets[0]?.id ?? 1, [supermarkets])
   const effectiveMarketId = selectedMarketId ?? defaultMarketId
 
+  // Live-Updates anderer Geräte per Server-Sent Events
+  const [liveConnected, setLiveConnected] = useState(false)
+  useEffect(() => {
+    if (!online || !effectiveMarketId) return
+    const close = api.list.subscribe(
+      effectiveMarketId,
+      () => queryClient.invalidateQueries({ queryKey: ['activeList', effectiveMarketId] }),
+      setLiveConnected,
+    )
+    return () => {
+      close()
+      setLiveConnected(false)
+    }
+  }, [online, effectiveMarketId, queryClient])
+
   const { data: activeList, isLoading } = useQuery({
     queryKey: ['activeList', effectiveMarketId],
     queryFn: () => api.list.getActive(effectiveMarketId),
     enabled: !!effectiveMarketId,
-    refetchInterval: online ? 30000 : false, // 30 Sekunden statt 10
+    // Polling nur noch als Fallback, solange kein Live-Stream verbunden ist
+    refetchInterval: online && !liveConnected ? 30000 : false,
     staleTime: 5000, // Daten bleiben 5 Sekunden "frisch"
   })
 
-  const { data: products = [] } = useQuery({
+  // Katalog seitenweise per Cursor laden: die erste Seite wird sofort
+  // angezeigt, die weiteren werden im Hintergrund nachgeladen
+  const {
+    data: productPages,
+    hasNextPage,
+    isFetchingNextPage,
+    fetchNextPage,
+  } = useInfiniteQuery({
     queryKey: ['products', effectiveMarketId],
-    queryFn: () => api.products.getAll({ active: true, supermarketId: effectiveMarketId }),
+    queryFn: ({ pageParam }) =>
+      api.products.getPage({
+        cursor: pageParam,
+        limit: PRODUCT_PAGE_SIZE,
+        active: true,
+        supermarketId: effectiveMarketId,
+      }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     enabled: !!effectiveMarketId,
   })
+  useEffect(() => {
+    if (hasNextPage && !isFetchingNextPage) fetchNextPage()
+  }, [hasNextPage, isFetchingNextPage, fetchNextPage])
+  const products = useMemo(
+    () => productPages?.pages.flatMap((page) => page.items) ?? [],
+    [productPages],
+  )
 
   const { data: categories = [] } = useQuery({
     queryKey: ['categories'],
@@ -50,6 +50,42 @@ export interface Product {
   prices?: ProductPrice[];
 }
 
+export interface PriceHistoryBucket {
+  bucket: string;  // first day of the day/week/month
+  min_cents: number;
+  max_cents: number;
+  avg_cents: number;
+  last_cents: number;
+  count: number;
+}
+
+export interface PriceHistory {
+  product_id: number;
+  resolution: 'day' | 'week' | 'month';
+  start: string;
+  end: string;
+  start_price_cents: number | null;
+  buckets: PriceHistoryBucket[];
+}
+
+export interface SpendingTotals {
+  total_cents: number;
+  item_count: number;
+}
+
+export interface SpendingAnalytics extends SpendingTotals {
+  start: string | null;
+  end: string | null;
+  months: Array<SpendingTotals & { month: string }>;  // first day of the month (UTC)
+  supermarkets: Array<SpendingTotals & { supermarket_id: number; name: string }>;
+  categories: Array<SpendingTotals & { category_id: number | null; name: string | null }>;
+}
+
+export interface ProductPage {
+  items: Product[];
+  next_cursor: string | null;
+}
+
 export interface ListItem {
   id: number;
   list_id: number;
@@ -94,12 +130,21 @@ export interface PurchaseItem {
   product: Product;
 }
 
+export interface SyncTombstone {
+  entity_type: string;
+  entity_id: number;
+  change_seq: number;
+  deleted_at: string;
+}
+
 export interface SyncResponse {
   categories: Category[];
   products: Product[];
   product_prices: ProductPrice[];
   list_items: ListItem[];
+  deleted: SyncTombstone[];
   timestamp: string;
+  seq: number | null;
 }
 
 export interface MealIngredient {
@@ -145,6 +190,20 @@ export interface MealUpdate {
   ingredients?: MealIngredientCreate[];
 }
 
+export type ListItemOperation =
+  | { op: 'add'; product_id: number; qty?: number }
+  | { op: 'update'; item_id: number; qty?: number; is_checked?: boolean }
+  | { op: 'delete'; item_id: number };
+
+export interface ListEvent {
+  type: 'item_added' | 'item_updated' | 'item_removed' | 'list_cleared' | 'list_changed' | 'resync';
+  supermarket_id: number;
+  list_id: number;
+  item?: { id: number; product_id: number; qty: number; is_checked: boolean };
+  item_id?: number;
+  purchase_id?: number;
+}
+
 // ============= API Functions =============
 
 async function fetchAPI<T>(endpoint: string, options?: RequestInit): Promise<T> {
@@ -188,17 +247,28 @@ export const api = {
 
   // Products
   products: {
-    getAll: (params?: { search?: string; category?: number; active?: boolean; supermarketId?: number }) => {
+    getPage: (params?: { cursor?: string; limit?: number; search?: string; category?: number; active?: boolean; supermarketId?: number }) => {
       const query = new URLSearchParams();
+      if (params?.cursor) query.set('cursor', params.cursor);
+      if (params?.limit !== undefined) query.set('limit', params.limit.toString());
       if (params?.search) query.set('search', params.search);
       if (params?.category !== undefined) query.set('category', params.category.toString());
       if (params?.active !== undefined) query.set('active', params.active.toString());
       if (params?.supermarketId !== undefined) query.set('supermarket_id', params.supermarketId.toString());
-      
-      return fetchAPI<Product[]>(`/api/products?${query}`);
+
+      return fetchAPI<ProductPage>(`/api/products/page?${query}`);
     },
     
     getOne: (id: number) => fetchAPI<Product>(`/api/products/${id}`),
+
+    getPriceHistory: (id: number, params?: { resolution?: 'day' | 'week' | 'month'; start?: string; end?: string }) => {
+      const query = new URLSearchParams();
+      if (params?.resolution) query.set('resolution', params.resolution);
+      if (params?.start) query.set('start', params.start);
+      if (params?.end) query.set('end', params.end);
+
+      return fetchAPI<PriceHistory>(`/api/products/${id}/prices/history?${query}`);
+    },
     
     create: (data: {
       name: string;
@@ -239,6 +309,12 @@ export const api = {
         body: JSON.stringify({ product_id, qty }),
       }),
     
+    addItems: (items: { product_id: number; qty?: number }[], supermarketId: number = 1) =>
+      fetchAPI<ListItem[]>(`/api/lists/active/items/bulk?supermarket_id=${supermarketId}`, {
+        method: 'POST',
+        body: JSON.stringify({ items }),
+      }),
+    
     updateItem: (id: number, data: { qty?: number; is_checked?: boolean }, supermarketId: number = 1) =>
       fetchAPI<ListItem>(`/api/lists/active/items/${id}?supermarket_id=${supermarketId}`, {
         method: 'PATCH',
@@ -247,6 +323,27 @@ export const api = {
     
     removeItem: (id: number, supermarketId: number = 1) =>
       fetchAPI<void>(`/api/lists/active/items/${id}?supermarket_id=${supermarketId}`, { method: 'DELETE' }),
+
+    // Several add/update/delete operations in one request and transaction
+    batch: (operations: ListItemOperation[], supermarketId: number = 1) =>
+      fetchAPI<{ items: ListItem[]; deleted: number[] }>(`/api/lists/active/batch?supermarket_id=${supermarketId}`, {
+        method: 'POST',
+        body: JSON.stringify({ operations }),
+      }),
+
+    // Server-Sent Events for changes made by other clients; EventSource
+    // reconnects on its own. Returns a function that closes the stream.
+    subscribe: (
+      supermarketId: number,
+      onEvent: (event: ListEvent) => void,
+      onStatus?: (connected: boolean) => void,
+    ) => {
+      const source = new EventSource(`${API_BASE}/api/lists/active/events?supermarket_id=${supermarketId}`);
+      source.onopen = () => onStatus?.(true);
+      source.onerror = () => onStatus?.(false);
+      source.onmessage = (message) => onEvent(JSON.parse(message.data));
+      return () => source.close();
+    },
   },
 
   // Purchases
@@ -261,6 +358,9 @@ export const api = {
   sync: {
     since: (timestamp: string) =>
       fetchAPI<SyncResponse>(`/api/sync/since?ts=${encodeURIComponent(timestamp)}`),
+
+    sinceSeq: (seq: number) =>
+      fetchAPI<SyncResponse>(`/api/sync/since?seq=${seq}`),
     
     pushChanges: (changes: any[]) =>
       fetchAPI<any>('/api/sync/changes', {
@@ -311,6 +411,17 @@ export const api = {
     delete: (id: number) => fetchAPI<void>(`/api/events/${id}`, { method: 'DELETE' }),
   },
 
+  analytics: {
+    getSpending: (params?: { start?: string; end?: string; supermarketId?: number }) => {
+      const query = new URLSearchParams();
+      if (params?.start) query.set('start', params.start);
+      if (params?.end) query.set('end', params.end);
+      if (params?.supermarketId !== undefined) query.set('supermarket_id', params.supermarketId.toString());
+
+      return fetchAPI<SpendingAnalytics>(`/api/analytics/spending?${query}`);
+    },
+  },
+
   supermarkets: {
     getAll: () => fetchAPI<Supermarket[]>('/api/supermarkets/'),
     
@@ -2,7 +2,7 @@
  * Dexie.js IndexedDB configuration for offline storage.
  */
 import Dexie, { Table } from 'dexie';
-import type { Category, Product, ProductPrice, ListItem } from './api';
+import type { Category, Product, ProductPrice, ListItem, SyncTombstone } from './api';
 
 export class GroceriesDB extends Dexie {
   categories!: Table<Category>;
@@ -26,10 +26,12 @@ export class GroceriesDB extends Dexie {
 
 export interface OfflineQueueItem {
   id?: number;
+  change_id: string;  // idempotency key, lets the server ignore retried changes
   entity_type: string;
   entity_id?: number;
   operation: 'create' | 'update' | 'delete';
   data?: any;
+  supermarket_id?: number;  // list_item creates: whose active list (default 1)
   timestamp: string;
   synced: boolean;
 }
@@ -38,9 +40,10 @@ export const db = new GroceriesDB();
 
 // Helper functions for offline queue
 export const offlineQueue = {
-  async add(item: Omit<OfflineQueueItem, 'id' | 'timestamp' | 'synced'>) {
+  async add(item: Omit<OfflineQueueItem, 'id' | 'change_id' | 'timestamp' | 'synced'>) {
     await db.offlineQueue.add({
       ...item,
+      change_id: crypto.randomUUID(),
       timestamp: new Date().toISOString(),
       synced: false
     });
@@ -79,6 +82,18 @@ export const syncHelpers = {
     await db.listItems.bulkPut(items);
   },
 
+  async applyDeletions(deleted: SyncTombstone[]) {
+    const tables: Record<string, Table<any>> = {
+      category: db.categories,
+      product: db.products,
+      product_price: db.productPrices,
+      list_item: db.listItems,
+    };
+    for (const tombstone of deleted) {
+      await tables[tombstone.entity_type]?.delete(tombstone.entity_id);
+    }
+  },
+
   async getLastSyncTime(): Promise<string> {
     const lastSync = localStorage.getItem('lastSyncTime');
     return lastSync || new Date(0).toISOString();
@@ -86,6 +101,15 @@ export const syncHelpers = {
 
   async setLastSyncTime(time: string) {
     localStorage.setItem('lastSyncTime', time);
+  },
+
+  async getLastSyncSeq(): Promise<number | null> {
+    const lastSeq = localStorage.getItem('lastSyncSeq');
+    return lastSeq === null ? null : Number(lastSeq);
+  },
+
+  async setLastSyncSeq(seq: number) {
+    localStorage.setItem('lastSyncSeq', seq.toString());
   }
 };
 
@@ -15,8 +15,11 @@ export async function syncFromServer(): Promise<void> {
   try {
     isSyncing = true;
     
-    const lastSync = await syncHelpers.getLastSyncTime();
-    const response = await api.sync.since(lastSync);
+    // Prefer the server change sequence; fall back to timestamps once
+    const lastSeq = await syncHelpers.getLastSyncSeq();
+    const response = lastSeq !== null
+      ? await api.sync.sinceSeq(lastSeq)
+      : await api.sync.since(await syncHelpers.getLastSyncTime());
     
     // Update local database
     if (response.categories.length > 0) {
@@ -34,15 +37,23 @@ export async function syncFromServer(): Promise<void> {
     if (response.list_items.length > 0) {
       await syncHelpers.syncListItems(response.list_items);
     }
+
+    if (response.deleted.length > 0) {
+      await syncHelpers.applyDeletions(response.deleted);
+    }
     
-    // Update last sync time
+    // Update last sync cursor
     await syncHelpers.setLastSyncTime(response.timestamp);
+    if (response.seq !== null) {
+      await syncHelpers.setLastSyncSeq(response.seq);
+    }
     
     console.log('✅ Sync from server completed', {
       categories: response.categories.length,
       products: response.products.length,
       prices: response.product_prices.length,
-      listItems: response.list_items.length
+      listItems: response.list_items.length,
+      deleted: response.deleted.length
     });
   } catch (error) {
     console.error('❌ Sync from server failed:', error);